@@ -0,0 +1,146 @@
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from app.config.settings import LOG_LEVEL, LOG_FORMAT, LOG_SAMPLING, LOG_QUEUE_SIZE
+from app.monitoring.metrics import registry
+
+# Correlation id of the request being processed, propagated to the tasks it creates
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# The attributes of every LogRecord, the other ones are the extra fields of the log
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+def parse_sampling_rates(sampling: str) -> Dict[int, float]:
+    # "DEBUG:0.01,INFO:0.5" -> {logging.DEBUG: 0.01, logging.INFO: 0.5}
+    rates = {}
+    for rule in filter(None, (rule.strip() for rule in sampling.split(","))):
+        level, rate = rule.split(":")
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a ratio of the high-volume levels logs, the levels without rate are all kept
+    """
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        return rate is None or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        log = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                log[key] = value
+        if record.exc_info:
+            log["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log, default=str)
+
+log_records_dropped_total = registry.counter(
+    "log_records_dropped_total", "Number of log records dropped because the logging queue was full"
+)
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Queue handler called on the event loop: it only captures the request id and enqueues the record.
+    The formatting and the writing are done by the listener thread, and the records are
+    dropped (and counted) instead of blocking when the queue is full.
+    """
+
+    def prepare(self, record):
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped_total.inc()
+
+class Logging:
+    listener: QueueListener = None
+
+logging_state = Logging()
+
+def setup_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT, sampling: str = LOG_SAMPLING,
+                  queue_size: int = LOG_QUEUE_SIZE, stream=None):
+    """
+    Configure the "app" loggers: the records go through a bounded queue to a listener thread
+    writing them on stdout (as JSON lines by default)
+    """
+    if logging_state.listener:
+        return
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    queue_handler = ContextQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(SamplingFilter(parse_sampling_rates(sampling)))
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(level)
+    app_logger.addHandler(queue_handler)
+    app_logger.propagate = False
+    logging_state.listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    logging_state.listener.start()
+
+def stop_logging():
+    # Writes the queued records before returning
+    if logging_state.listener:
+        logging_state.listener.stop()
+        logging_state.listener = None
+        app_logger = logging.getLogger("app")
+        for handler in list(app_logger.handlers):
+            if isinstance(handler, ContextQueueHandler):
+                app_logger.removeHandler(handler)
+        app_logger.propagate = True
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware setting the correlation id of each request, from its X-Request-ID header
+    or a new one, and returning it in the X-Request-ID response header
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))])
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -1,4 +1,3 @@
-from pydantic_settings  import BaseSettings
 from dotenv import load_dotenv
 import os
 
@@ -9,3 +8,76 @@ MONGO_URI = f"mongodb://{os.getenv('MONGO_USERNAME')}:" \
             f"{os.getenv('MONGO_PASSWORD')}@" \
             f"{os.getenv('MONGO_HOST')}:{os.getenv('MONGO_PORT')}"
 MONGO_DB = os.getenv("MONGO_DATABASE")
+
+# Real-time notifications of events start/stop transitions
+NOTIFIER_HORIZON_HOURS = float(os.getenv("NOTIFIER_HORIZON_HOURS", "24"))
+NOTIFIER_KEEPALIVE_SECONDS = float(os.getenv("NOTIFIER_KEEPALIVE_SECONDS", "15"))
+NOTIFIER_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("NOTIFIER_SUBSCRIBER_QUEUE_SIZE", "100"))
+# Delay between two reloads of the upcoming events (0: half the horizon), app.serve sets it with several workers
+NOTIFIER_RELOAD_SECONDS = float(os.getenv("NOTIFIER_RELOAD_SECONDS", "0"))
+# Delay between two refreshes of the precomputed next occurrence of the recurring events
+SERIES_REFRESH_SECONDS = float(os.getenv("SERIES_REFRESH_SECONDS", "60"))
+
+# Events storage backend: mongodb, memory or sqlite
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongodb")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "events.db")
+
+# On-demand requests profiling (X-Profile header or profile query parameter), disabled by default
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILES_DIR = os.getenv("PROFILES_DIR", "profiles")
+# Only the most recent profile files are kept
+PROFILES_MAX_FILES = int(os.getenv("PROFILES_MAX_FILES", "100"))
+
+# Database operations slower than this threshold are logged with their explain() summary (negative to disable)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+# A filter shape is explained at most once per interval, and at most this number of explains run at once
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "300"))
+SLOW_QUERY_MAX_EXPLAINS = int(os.getenv("SLOW_QUERY_MAX_EXPLAINS", "2"))
+
+# Structured logging: level, format (json or text), sampling rates per level (DEBUG:0.01,INFO:0.5) and queue size
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Admission control: total and per route class (read, write, bulk) concurrency limits, wait queue sizes and deadlines (seconds)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", "48"))
+ADMISSION_READ_QUEUE = int(os.getenv("ADMISSION_READ_QUEUE", "256"))
+ADMISSION_READ_TIMEOUT = float(os.getenv("ADMISSION_READ_TIMEOUT", "2"))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", "16"))
+ADMISSION_WRITE_QUEUE = int(os.getenv("ADMISSION_WRITE_QUEUE", "128"))
+ADMISSION_WRITE_TIMEOUT = float(os.getenv("ADMISSION_WRITE_TIMEOUT", "5"))
+ADMISSION_BULK_LIMIT = int(os.getenv("ADMISSION_BULK_LIMIT", "2"))
+ADMISSION_BULK_QUEUE = int(os.getenv("ADMISSION_BULK_QUEUE", "4"))
+ADMISSION_BULK_TIMEOUT = float(os.getenv("ADMISSION_BULK_TIMEOUT", "10"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Production server (python -m app.serve): number of worker processes (default: the CPU count) and shutdown drain timeout
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0"))
+SERVE_GRACEFUL_TIMEOUT = float(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+
+# MongoDB connection: pool warmed up on startup, server selection timeout and background connection retries backoff (seconds)
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_DELAY = float(os.getenv("MONGO_CONNECT_DELAY", "0.5"))
+MONGO_CONNECT_MAX_DELAY = float(os.getenv("MONGO_CONNECT_MAX_DELAY", "30"))
+# Readiness probe: timeout of its database ping, and how long its result is reused by the next probes
+READINESS_PING_TIMEOUT = float(os.getenv("READINESS_PING_TIMEOUT", "1"))
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+
+# Events by id cache: maximum number of cached events (0 to disable) and time to live in seconds (0: no expiry).
+# Each worker has its own cache, a worker can return an event changed by another one until its entry expires
+EVENTS_CACHE_SIZE = int(os.getenv("EVENTS_CACHE_SIZE", "10000"))
+EVENTS_CACHE_TTL_SECONDS = float(os.getenv("EVENTS_CACHE_TTL_SECONDS", "5"))
+# Maximum number of ids of a get_many request
+GET_MANY_MAX_IDS = int(os.getenv("GET_MANY_MAX_IDS", "5000"))
+
+# Responses compression (gzip, or zstd when zstandard is installed) above a body size in bytes
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
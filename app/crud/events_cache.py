@@ -0,0 +1,87 @@
+import time
+from itertools import count
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from app.config.settings import EVENTS_CACHE_SIZE, EVENTS_CACHE_TTL_SECONDS
+from app.models.events import EventOut
+from app.monitoring.metrics import registry
+
+events_cache_lookups_total = registry.counter(
+    "events_cache_lookups_total", "Number of events looked up in the events by id cache", ("result",)
+)
+
+class EventsCache:
+    """
+    Bounded LRU cache of the events created or read by id, kept coherent by events_crud:
+    the updates and the deletions invalidate their entry, and the bulk operations clear the cache.
+    An entry expires after the time to live (if any), and a recurring event when its current occurrence is over
+    (its next_start and next_stop are stale then).
+    Each invalidation gives the event a new version: a reader takes the version before reading the storage,
+    and its put is ignored if the event has been written meanwhile, so a stale read never replaces a write.
+    """
+    def __init__(self, max_size: int = EVENTS_CACHE_SIZE, ttl: float = EVENTS_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        # event id -> (event, monotonic expiry or None, series expiry datetime or None)
+        self._events: "OrderedDict[str, tuple]" = OrderedDict()
+        # event id -> version of its last write, the forgotten ids have the floor version
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._counter = count(1)
+        self._floor = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def get(self, event_id: str, now: datetime) -> Optional[EventOut]:
+        entry = self._events.get(event_id)
+        if entry is None:
+            events_cache_lookups_total.inc("miss")
+            return None
+        event, expiry, series_expiry = entry
+        if (expiry is not None and expiry <= time.monotonic()) or (series_expiry is not None and series_expiry <= now):
+            del self._events[event_id]
+            events_cache_lookups_total.inc("miss")
+            return None
+        self._events.move_to_end(event_id)
+        events_cache_lookups_total.inc("hit")
+        return event
+
+    def get_many(self, event_ids: Iterable[str], now: datetime) -> Dict[str, EventOut]:
+        events = {}
+        for event_id in event_ids:
+            event = self.get(event_id, now)
+            if event is not None:
+                events[event_id] = event
+        return events
+
+    def version(self, event_id: str) -> int:
+        return self._versions.get(event_id, self._floor)
+
+    def put(self, event: EventOut, version: Optional[int] = None):
+        if self.max_size <= 0 or (version is not None and version != self.version(event.id)):
+            return
+        expiry = time.monotonic() + self.ttl if self.ttl > 0 else None
+        series_expiry = event.next_stop if event.recurrence else None
+        self._events[event.id] = (event, expiry, series_expiry)
+        self._events.move_to_end(event.id)
+        while len(self._events) > self.max_size:
+            self._events.popitem(last=False)
+
+    def invalidate(self, event_id: str):
+        self._events.pop(event_id, None)
+        self._versions[event_id] = next(self._counter)
+        self._versions.move_to_end(event_id)
+        while len(self._versions) > max(self.max_size, 1):
+            # The floor stays above the forgotten versions, so their readers puts are still ignored
+            _, forgotten_version = self._versions.popitem(last=False)
+            self._floor = max(self._floor, forgotten_version)
+
+    def clear(self):
+        self._events.clear()
+        self._versions.clear()
+        self._floor = next(self._counter)
+
+events_cache = EventsCache()
+
+registry.gauge("events_cache_size", "Number of events in the events by id cache", function=lambda: len(events_cache))
@@ -1,18 +1,29 @@
-from app.db.mongodb import get_db
-from app.models.events import EventCreate, EventOut
+from app.db.storage import get_storage, EventsFilter
+from app.models.events import EventCreate, EventOut, parse_date_formats, to_naive_datetime
+from app.crud.events_recurrence import get_next_occurrence, get_series_fields, iter_occurrences
+from app.crud.events_cache import events_cache
+from app.notifications.events_notifier import events_notifier
+from app.config.settings import SERIES_REFRESH_SECONDS
 import asyncio
+import logging
 from bson import ObjectId
+from itertools import islice
 from typing import List
-from fastapi import HTTPException
+from starlette.exceptions import HTTPException
 from datetime import datetime
-from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
 
 # Create new event
 async def create_event(event: EventCreate):
     await asyncio.sleep(0.5)
-    db = get_db()
-    new_event = await db["events"].insert_one(event.dict())
-    new_event_out = get_event_out(id=str(new_event.inserted_id), event=event.dict())
+    event_document = event.dict()
+    if event.recurrence:
+        event_document.update(get_series_fields(event_document, get_time_now()))
+    new_event_id = await get_storage().insert_event(event_document)
+    new_event_out = get_event_out(id=new_event_id, event=event_document)
+    events_cache.put(new_event_out)
+    events_notifier.event_changed(new_event_out.dict())
     return new_event_out
 
 def get_event_out(id: str, event: dict):
@@ -28,14 +39,44 @@ def get_event_id(event_id: str):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid event ID format")
 
-# Get the list of all events
-async def get_all_events(skip, limit):
-    db = get_db()
+# Create the indexes used by the events queries
+async def create_events_indexes():
+    await get_storage().create_indexes()
+
+# Moving the precomputed next occurrence of the recurring events whose occurrence is over
+async def refresh_recurring_events(now: datetime):
+    storage = get_storage()
+    updates = []
+    async for event in storage.find_events(EventsFilter(stale_series_at=now)):
+        updates.append((event["_id"], get_series_fields(event, now)))
+        events_cache.invalidate(str(event["_id"]))
+    await storage.update_events_by_id(updates)
+
+# Runs in the background, so the listings don't scan and write the recurring events on every request
+async def refresh_recurring_events_periodically(interval: float = SERIES_REFRESH_SECONDS):
+    while True:
+        try:
+            await refresh_recurring_events(get_time_now())
+        except Exception as e:
+            logger.error("Cannot refresh the recurring events because of %s", e)
+        await asyncio.sleep(interval)
+
+# Get a page of events matching the filter. With fields, the events are dicts of the id and these fields
+async def find_events(events_filter: EventsFilter, skip, limit, fields: List[str] = None):
+    storage = get_storage()
     events = []
-    total_events = await db["events"].count_documents({})
-    all_events = db["events"].find({}).skip(skip).limit(limit)
-    async for event in all_events:
-        events.append(get_event_out(id=str(event["_id"]), event=event))
+    now = get_time_now()
+    total_events = await storage.count_events(events_filter)
+    async for event in storage.find_events(events_filter, skip, limit, fields=fields):
+        if fields is None:
+            events.append(get_current_event_out(event, now))
+        else:
+            events.append({"id": str(event["_id"]), **{field: event.get(field) for field in fields}})
+    return total_events, events
+
+# Get the list of all events
+async def get_all_events(skip, limit, fields: List[str] = None):
+    total_events, events = await find_events(EventsFilter(), skip, limit, fields)
     return {
         "total": total_events,
         "skip": skip,
@@ -44,20 +85,9 @@ async def get_all_events(skip, limit):
     }
 
 # Get running events
-async def get_running_events(skip, limit):
+async def get_running_events(skip, limit, fields: List[str] = None):
     now = get_time_now()
-    db = get_db()
-    running_events = []
-    query = {
-        "$or": [
-            {"start": {"$lte": now}, "stop": {"$gte": now}},
-            {"start": {"$lte": now}, "$or": [ {"stop": None}, {"stop": { "$exists": False }} ] }
-        ]
-    }
-    total_running_events = await db["events"].count_documents(query)
-    events = db["events"].find(query).skip(skip).limit(limit)
-    async for event in events:
-        running_events.append(get_event_out(id=str(event["_id"]), event=event))
+    total_running_events, running_events = await find_events(EventsFilter(running_at=now), skip, limit, fields)
     return {
         "total": total_running_events,
         "skip": skip,
@@ -66,14 +96,8 @@ async def get_running_events(skip, limit):
     }
 
 # Search an event from tags
-async def search_event(tags: List[str], skip, limit):
-    db = get_db()
-    events = []
-    query = {"tags": {"$in": tags}}
-    total_events = await db["events"].count_documents(query)
-    events_db_list = db["events"].find(query).skip(skip).limit(limit)
-    async for event in events_db_list:
-        events.append(get_event_out(id=str(event["_id"]), event=event))
+async def search_event(tags: List[str], skip, limit, fields: List[str] = None):
+    total_events, events = await find_events(EventsFilter(tags=tags), skip, limit, fields)
     if not events:
         raise HTTPException(status_code=404, detail=f"Events with at least one tag from tags {tags} don't exist")
     return {
@@ -83,96 +107,193 @@ async def search_event(tags: List[str], skip, limit):
         "results": events
     }
 
+# The output of an event read by id, with the current occurrence of a recurring event
+def get_current_event_out(event: dict, now: datetime):
+    if EventsFilter(stale_series_at=now).matches(event):
+        event.update(get_series_fields(event, now))
+    return get_event_out(id=str(event["_id"]), event=event)
+
+# Get an event by id
+async def get_event_by_id(event_id: str):
+    validated_event_id = get_event_id(event_id)
+    now = get_time_now()
+    event_out = events_cache.get(str(validated_event_id), now)
+    if event_out is None:
+        version = events_cache.version(str(validated_event_id))
+        event = await get_storage().get_event(validated_event_id)
+        if not event:
+            raise HTTPException(status_code=404, detail=f"Event with id {event_id} is not found")
+        event_out = get_current_event_out(event, now)
+        events_cache.put(event_out, version)
+    return event_out
+
+# Get many events by id, with a single query for the events which are not cached
+async def get_many_events(event_ids: List[str]):
+    validated_event_ids = list(dict.fromkeys(get_event_id(event_id) for event_id in event_ids))
+    now = get_time_now()
+    events = events_cache.get_many([str(event_id) for event_id in validated_event_ids], now)
+    missing_event_ids = [event_id for event_id in validated_event_ids if str(event_id) not in events]
+    if missing_event_ids:
+        versions = {str(event_id): events_cache.version(str(event_id)) for event_id in missing_event_ids}
+        for event in await get_storage().get_events(missing_event_ids):
+            event_out = get_current_event_out(event, now)
+            events_cache.put(event_out, versions[event_out.id])
+            events[event_out.id] = event_out
+    results = [events[str(event_id)] for event_id in validated_event_ids if str(event_id) in events]
+    return {
+        "total": len(results),
+        "results": results,
+        "not_found": [str(event_id) for event_id in validated_event_ids if str(event_id) not in events]
+    }
+
 # Deleting event by event_id
 async def delete_event(event_id: str, force_delete: bool = False):
     validated_event_id  = get_event_id(event_id)
-    db = get_db()
-    event = await db["events"].find_one({"_id": validated_event_id})
+    storage = get_storage()
+    event = await storage.get_event(validated_event_id)
     if not event:
         raise HTTPException(status_code=404, detail=f"Event with id {event_id} is not found")
     time_now = get_time_now()
+    start, stop = event["start"], event.get("stop")
+    # A recurring event is checked on its current (or next) occurrence
+    if event.get("recurrence"):
+        start, stop = get_next_occurrence(event, time_now)
     is_ongoing = (
-        event["start"] <= time_now and
+        start <= time_now and
         (
-            event.get("stop") is None or event.get("stop") > time_now
+            stop is None or stop > time_now
         )
     )
-    start_in_future  = (event["start"] > time_now)
+    start_in_future  = (start > time_now)
     if is_ongoing and not force_delete:
-        print(f"We cannot delete the event {event_id}, its an ongoing event and force_delete=False")
+        logger.info("We cannot delete the event %s, its an ongoing event and force_delete=False", event_id, extra={"event_id": event_id})
         return False
     elif start_in_future and not force_delete:
-        print(f"We cannot delete the event {event_id}, it will start in the future and force_delete=False")
+        logger.info("We cannot delete the event %s, it will start in the future and force_delete=False", event_id, extra={"event_id": event_id})
         return False
     else:
-        await db["events"].delete_one({"_id": validated_event_id})
-        print(f"event {event_id} has been deleted successfully")
+        await storage.delete_event(validated_event_id)
+        events_cache.invalidate(str(validated_event_id))
+        events_notifier.event_deleted(event_id, get_event_out(id=event_id, event=event).dict())
+        logger.info("event %s has been deleted successfully", event_id, extra={"event_id": event_id})
         return True
 
 # Deleting all events
 async def delete_all_events(force_delete: bool = False):
     now = get_time_now()
-    db = get_db()
-    total_events = await get_all_events(skip=0,limit=100)
+    storage = get_storage()
+    total_events = await storage.count_events(EventsFilter())
     if force_delete:
-        deleted_events = await db["events"].delete_many({})
+        deleted_events_count = await storage.delete_events(EventsFilter())
+        events_notifier.events_deleted()
     else:
-        query_stopped_events = {
-            "$and": [
-                {"start": {"$lte": now}},
-                {"stop": {"$lte": now}}
-            ]
-        }
-        deleted_events = await db["events"].delete_many(query_stopped_events)
-
-    if deleted_events.deleted_count > 0:
-        print(f"All of {deleted_events.deleted_count} events have been deleted successfully")
-        return total_events["total"], deleted_events.deleted_count
-    elif total_events["total"] != 0 and deleted_events.deleted_count == 0:
-        print(f"There is no events to delete, there is no stopped events and force_delete=False")
-        return total_events["total"], 0
+        deleted_events_count = await storage.delete_events(EventsFilter(stopped_at=now))
+    events_cache.clear()
+
+    if deleted_events_count > 0:
+        logger.info("All of %d events have been deleted successfully", deleted_events_count, extra={"deleted_count": deleted_events_count})
+        return total_events, deleted_events_count
+    elif total_events != 0 and deleted_events_count == 0:
+        logger.info("There is no events to delete, there is no stopped events and force_delete=False")
+        return total_events, 0
     else :
-        print(f"There is no events to delete ! all events have been deleted")
+        logger.info("There is no events to delete ! all events have been deleted")
         return 0, 0
 
-async def update_event_based_on_id(event_id, update_query:dict):
+async def update_event_based_on_id(event_id, set_fields:dict = None, add_tags:List[str] = None):
     validated_event_id = get_event_id(event_id)
-    db = get_db()
-    updated_event = await db["events"].find_one_and_update(
-        {"_id": validated_event_id},
-        update_query,
-        return_document=ReturnDocument.AFTER
-    )
+    updated_event = await get_storage().update_event(validated_event_id, set_fields=set_fields, add_tags=add_tags)
+    events_cache.invalidate(str(validated_event_id))
     return updated_event
 
 # Updating event tags
 async def updating_event_tags(event_id:str, tags:List[str], replace:bool = False):
     if replace:
-        update_query = {"$set": {"tags": tags}}
+        updated_event = await update_event_based_on_id(event_id, set_fields={"tags": tags})
     else:
-        update_query = {"$addToSet": {"tags": {"$each": tags}}}
-    updated_event = await update_event_based_on_id(event_id, update_query)
+        updated_event = await update_event_based_on_id(event_id, add_tags=tags)
     if not updated_event:
         raise HTTPException(status_code=404, detail="Event not found")
     else:
         updated_event_out = get_event_out(id=str(updated_event["_id"]), event=updated_event)
+        events_notifier.event_changed(updated_event_out.dict())
         return updated_event_out
 
+def get_datetime(value):
+    # The CLI passes the datetimes as strings
+    value = parse_date_formats(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid datetime {value}")
+    return value
+
+def check_recurring_datetime(event: dict, start: datetime, stop: datetime):
+    # A recurring event needs a stop after its start, and the series must not end before its first occurrence
+    if stop is None:
+        raise HTTPException(status_code=400, detail=f"Recurring event {event['_id']} must have a stop datetime")
+    if to_naive_datetime(stop) <= to_naive_datetime(start):
+        raise HTTPException(status_code=400, detail="Stop datetime must be after start datetime")
+    until = event["recurrence"].get("until")
+    if until is not None and to_naive_datetime(until) < to_naive_datetime(start):
+        raise HTTPException(status_code=400, detail=f"Recurring event {event['_id']} ends before the start datetime")
+
+def get_datetime_fields(event: dict, start: datetime, stop: datetime, now: datetime):
+    # The start and stop, with the series fields of a recurring event, to be written together
+    set_fields = {"start": start, "stop": stop}
+    if event.get("recurrence"):
+        check_recurring_datetime(event, start, stop)
+        set_fields.update(get_series_fields({**event, **set_fields}, now))
+    return set_fields
+
 # Updating event datetime
 async def updating_event_datetime(event_id:str, start:datetime, stop:datetime=None):
-    update_query = {"$set": {"start": start, "stop": stop}}
-    updated_event = await update_event_based_on_id(event_id, update_query)
+    start, stop = get_datetime(start), get_datetime(stop)
+    event = await get_storage().get_event(get_event_id(event_id))
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    set_fields = get_datetime_fields(event, start, stop, get_time_now())
+    updated_event = await update_event_based_on_id(event_id, set_fields=set_fields)
     if not updated_event:
         raise HTTPException(status_code=404, detail="Event not found")
     else:
         updated_event_out = get_event_out(id=str(updated_event["_id"]), event=updated_event)
+        events_notifier.event_changed(updated_event_out.dict())
         return updated_event_out
 
 # Updating many events based on tags
 async def update_events_based_on_tags(tags:List[str], start:datetime, stop:datetime=None):
-    db = get_db()
-    result = await db["events"].update_many(
-        {"tags": {"$in": tags}},
-        {"$set": {"start": start, "stop": stop}}
-    )
-    return result.modified_count, result.matched_count
\ No newline at end of file
+    start, stop = get_datetime(start), get_datetime(stop)
+    storage = get_storage()
+    now = get_time_now()
+    # The recurring events are all validated before any write, each one is written with its series fields
+    series_updates = []
+    series_modified_count = 0
+    async for event in storage.find_events(EventsFilter(tags=tags, recurring=True)):
+        set_fields = get_datetime_fields(event, start, stop, now)
+        series_updates.append((event["_id"], set_fields))
+        if event["start"] != to_naive_datetime(start) or event.get("stop") != to_naive_datetime(stop):
+            series_modified_count += 1
+    modified_count, matched_count = await storage.update_events(EventsFilter(tags=tags, recurring=False), {"start": start, "stop": stop})
+    await storage.update_events_by_id(series_updates)
+    events_cache.clear()
+    modified_count += series_modified_count
+    matched_count += len(series_updates)
+    if modified_count > 0:
+        events_notifier.events_changed()
+    return modified_count, matched_count
+
+# Get the occurrences of an event within a time window
+async def get_event_occurrences(event_id: str, start: datetime, stop: datetime, skip, limit):
+    validated_event_id = get_event_id(event_id)
+    event = await get_storage().get_event(validated_event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail=f"Event with id {event_id} is not found")
+    occurrences = islice(iter_occurrences(event, window_start=start, window_stop=stop), skip, skip + limit)
+    return {
+        "id": event_id,
+        "skip": skip,
+        "limit": limit,
+        "results": [{"start": occurrence_start, "stop": occurrence_stop} for occurrence_start, occurrence_stop in occurrences]
+    }
\ No newline at end of file
@@ -0,0 +1,97 @@
+import json
+from datetime import datetime
+from typing import Iterator, List
+import numpy as np
+
+# Generation profiles:
+# - tags: number of distinct tags, tags_skew: Zipf exponent of the tags popularity (0 for uniform popularity)
+# - tags_per_event: (min, max) number of tags of an event
+# - past/running/future: ratios of stopped, running and future events
+# - open_ended: ratio of running and future events without stop
+# - mean_duration_hours: mean of the (exponential) events duration, span_days: time span of past and future events
+PROFILES = {
+    "uniform": {
+        "tags": 50, "tags_skew": 0.0, "tags_per_event": (1, 3),
+        "past": 0.6, "running": 0.1, "future": 0.3, "open_ended": 0.1,
+        "mean_duration_hours": 24, "span_days": 365,
+    },
+    "production": {
+        "tags": 2000, "tags_skew": 1.1, "tags_per_event": (1, 5),
+        "past": 0.85, "running": 0.03, "future": 0.12, "open_ended": 0.05,
+        "mean_duration_hours": 6, "span_days": 730,
+    },
+    "running-heavy": {
+        "tags": 200, "tags_skew": 0.8, "tags_per_event": (1, 4),
+        "past": 0.2, "running": 0.6, "future": 0.2, "open_ended": 0.4,
+        "mean_duration_hours": 72, "span_days": 90,
+    },
+}
+
+# Default reference datetime of the past/running/future events, fixed so a seed always generates the same events
+REFERENCE_DATETIME = datetime(2025, 1, 1)
+
+MICROSECONDS_PER_HOUR = 3600 * 10**6
+MICROSECONDS_PER_DAY = 24 * MICROSECONDS_PER_HOUR
+
+def get_tags_probabilities(profile: dict):
+    ranks = np.arange(1, profile["tags"] + 1, dtype=np.float64)
+    weights = ranks ** -profile["tags_skew"]
+    return weights / weights.sum()
+
+def generate_batch(profile: dict, size: int, seed: int, batch_index: int, now: datetime) -> List[dict]:
+    """
+    Generate a batch of events with vectorized numpy draws.
+    The batch only depends on the seed, the batch index, the size and the reference datetime.
+    """
+    generator = np.random.default_rng([seed, batch_index])
+    kinds = generator.choice(3, size=size, p=[profile["past"], profile["running"], profile["future"]])
+    durations = np.maximum(
+        generator.exponential(profile["mean_duration_hours"] * MICROSECONDS_PER_HOUR, size), 60 * 10**6
+    ).astype(np.int64)
+    offsets = (generator.random(size) * profile["span_days"] * MICROSECONDS_PER_DAY).astype(np.int64)
+    running_offsets = (generator.random(size) * durations).astype(np.int64)
+    open_ended = (generator.random(size) < profile["open_ended"]) & (kinds != 0)
+
+    # Past events stop before now, running events contain now and future events start after now
+    starts = np.select(
+        [kinds == 0, kinds == 1],
+        [-offsets - durations, -running_offsets],
+        offsets
+    )
+    now64 = np.datetime64(now, "us")
+    start_datetimes = (now64 + starts.astype("timedelta64[us]")).tolist()
+    stop_datetimes = (now64 + (starts + durations).astype("timedelta64[us]")).tolist()
+
+    min_tags, max_tags = profile["tags_per_event"]
+    tags_counts = generator.integers(min_tags, max_tags + 1, size)
+    tags = generator.choice(profile["tags"], size=(size, max_tags), p=get_tags_probabilities(profile))
+
+    events = []
+    for index in range(size):
+        event_tags = list(dict.fromkeys(f"tag{tag}" for tag in tags[index, :tags_counts[index]].tolist()))
+        events.append({
+            "start": start_datetimes[index],
+            "stop": None if open_ended[index] else stop_datetimes[index],
+            "tags": event_tags,
+        })
+    return events
+
+def generate_events(count: int, seed: int = 0, profile: str = "production", batch_size: int = 10000,
+                    now: datetime = None) -> Iterator[List[dict]]:
+    """
+    Lazily yields the batches of generated events, the output is deterministic for
+    a given seed, profile, batch size and reference datetime (REFERENCE_DATETIME by default)
+    """
+    now = now or REFERENCE_DATETIME
+    for batch_index, batch_start in enumerate(range(0, count, batch_size)):
+        yield generate_batch(PROFILES[profile], min(batch_size, count - batch_start), seed, batch_index, now)
+
+def to_ndjson(events: List[dict]):
+    return "".join(
+        json.dumps({
+            "start": event["start"].isoformat(),
+            "stop": event["stop"].isoformat() if event["stop"] else None,
+            "tags": event["tags"],
+        }) + "\n"
+        for event in events
+    )
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+from app.models.events import to_naive_datetime
+
+FREQUENCIES = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+def get_period(recurrence: dict):
+    return FREQUENCIES[recurrence["frequency"]] * recurrence.get("interval", 1)
+
+def get_last_index(start: datetime, recurrence: dict):
+    # Index of the last occurrence, None for a series without end
+    last_index = None
+    if recurrence.get("count") is not None:
+        last_index = recurrence["count"] - 1
+    if recurrence.get("until") is not None:
+        until = to_naive_datetime(recurrence["until"])
+        until_index = (until - start) // get_period(recurrence) if until >= start else -1
+        last_index = until_index if last_index is None else min(last_index, until_index)
+    return last_index
+
+def iter_occurrences(
+    event: dict,
+    window_start: Optional[datetime] = None,
+    window_stop: Optional[datetime] = None
+) -> Iterator[Tuple[datetime, datetime]]:
+    """
+    Lazily yields the (start, stop) of the event occurrences overlapping the window.
+    The first occurrence of the window is computed directly, so the series is never
+    expanded from its beginning.
+    """
+    start = to_naive_datetime(event["start"])
+    stop = to_naive_datetime(event.get("stop"))
+    recurrence = event.get("recurrence")
+    window_start = to_naive_datetime(window_start)
+    window_stop = to_naive_datetime(window_stop)
+    if not recurrence:
+        if (window_stop is None or start < window_stop) and \
+                (window_start is None or stop is None or stop > window_start):
+            yield start, stop
+        return
+    period = get_period(recurrence)
+    duration = stop - start
+    last_index = get_last_index(start, recurrence)
+    index = 0
+    if window_start is not None and window_start > stop:
+        index = (window_start - stop) // period
+    while last_index is None or index <= last_index:
+        occurrence_start = start + index * period
+        if window_stop is not None and occurrence_start >= window_stop:
+            return
+        occurrence_stop = occurrence_start + duration
+        if window_start is None or occurrence_stop > window_start:
+            yield occurrence_start, occurrence_stop
+        index += 1
+
+def get_next_occurrence(event: dict, now: datetime):
+    """
+    Current or next occurrence of a recurring event, or its last occurrence when the series is over
+    """
+    for occurrence in iter_occurrences(event, window_start=now):
+        return occurrence
+    start = to_naive_datetime(event["start"])
+    last_start = start + max(get_last_index(start, event["recurrence"]), 0) * get_period(event["recurrence"])
+    return last_start, last_start + (to_naive_datetime(event["stop"]) - start)
+
+def get_series_fields(event: dict, now: datetime):
+    """
+    Precomputed fields of a recurring event, used to keep the running events query index-driven:
+    next_start/next_stop are the current or next occurrence and series_stop the stop time
+    of the last occurrence (None for a series without end).
+    """
+    next_start, next_stop = get_next_occurrence(event, now)
+    start = to_naive_datetime(event["start"])
+    last_index = get_last_index(start, event["recurrence"])
+    series_stop = None
+    if last_index is not None:
+        series_stop = start + max(last_index, 0) * get_period(event["recurrence"]) + \
+                      (to_naive_datetime(event["stop"]) - start)
+    return {"next_start": next_start, "next_stop": next_stop, "series_stop": series_stop}
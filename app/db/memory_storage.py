@@ -0,0 +1,185 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import List, Optional
+from bson import ObjectId
+from app.db.storage import EventsStorage, EventsFilter, normalize_document, project_document
+
+def copy_document(document: dict):
+    # The callers can modify the returned documents without modifying the stored ones
+    document = dict(document)
+    document["tags"] = list(document.get("tags") or [])
+    if document.get("recurrence"):
+        document["recurrence"] = dict(document["recurrence"])
+    return document
+
+class MemoryEventsStorage(EventsStorage):
+    """
+    In-memory events storage, for the tests, the benchmarks and the small deployments.
+    The events are indexed by tag, by start and by stop datetimes.
+    """
+    def __init__(self):
+        self._events = {}
+        self._sequences = {}
+        self._ids = {}
+        self._next_sequence = 0
+        self._tags = {}
+        # Sorted (datetime, sequence) lists
+        self._starts = []
+        self._stops = []
+        self._open_ended = set()
+        self._series = set()
+
+    async def insert_event(self, document: dict):
+        event_id = document.get("_id") or ObjectId()
+        document = normalize_document(document)
+        document["_id"] = event_id
+        self._events[event_id] = document
+        self._sequences[event_id] = self._next_sequence
+        self._ids[self._next_sequence] = event_id
+        self._next_sequence += 1
+        self._index(event_id, document)
+        return str(event_id)
+
+    async def insert_events(self, documents: List[dict]):
+        return [await self.insert_event(document) for document in documents]
+
+    async def get_event(self, event_id):
+        event = self._events.get(event_id)
+        return copy_document(event) if event else None
+
+    async def get_events(self, event_ids: List):
+        return [copy_document(self._events[event_id]) for event_id in event_ids if event_id in self._events]
+
+    async def _find_events(self, events_filter: EventsFilter, skip: int, limit: Optional[int],
+                           fields: Optional[List[str]]):
+        stop = None if limit is None else skip + limit
+        for event_id in islice(self._matching_ids(events_filter), skip, stop):
+            yield project_document(copy_document(self._events[event_id]), fields)
+
+    async def count_events(self, events_filter: EventsFilter):
+        return sum(1 for _ in self._matching_ids(events_filter))
+
+    async def update_event(self, event_id, set_fields: Optional[dict] = None, add_tags: Optional[List[str]] = None):
+        event = self._events.get(event_id)
+        if event is None:
+            return None
+        self._update(event_id, set_fields or {}, add_tags)
+        return copy_document(self._events[event_id])
+
+    async def update_events(self, events_filter: EventsFilter, set_fields: dict):
+        matched = modified = 0
+        for event_id in list(self._matching_ids(events_filter)):
+            matched += 1
+            if self._update(event_id, set_fields):
+                modified += 1
+        return modified, matched
+
+    async def update_events_by_id(self, updates):
+        for event_id, set_fields in updates:
+            if event_id in self._events:
+                self._update(event_id, set_fields)
+
+    async def delete_event(self, event_id):
+        if event_id not in self._events:
+            return False
+        self._delete(event_id)
+        return True
+
+    async def delete_events(self, events_filter: EventsFilter):
+        event_ids = list(self._matching_ids(events_filter))
+        for event_id in event_ids:
+            self._delete(event_id)
+        return len(event_ids)
+
+    def _index(self, event_id, event: dict):
+        sequence = self._sequences[event_id]
+        for tag in event.get("tags") or []:
+            self._tags.setdefault(tag, set()).add(event_id)
+        insort(self._starts, (event["start"], sequence))
+        if event.get("stop") is None:
+            self._open_ended.add(event_id)
+        else:
+            insort(self._stops, (event["stop"], sequence))
+        if event.get("recurrence"):
+            self._series.add(event_id)
+
+    def _unindex(self, event_id, event: dict):
+        sequence = self._sequences[event_id]
+        for tag in event.get("tags") or []:
+            tagged_events = self._tags.get(tag)
+            if tagged_events is not None:
+                tagged_events.discard(event_id)
+                if not tagged_events:
+                    del self._tags[tag]
+        del self._starts[bisect_left(self._starts, (event["start"], sequence))]
+        if event.get("stop") is None:
+            self._open_ended.discard(event_id)
+        else:
+            del self._stops[bisect_left(self._stops, (event["stop"], sequence))]
+        self._series.discard(event_id)
+
+    def _update(self, event_id, set_fields: dict, add_tags: Optional[List[str]] = None):
+        event = self._events[event_id]
+        updated_event = normalize_document(dict(event, **set_fields))
+        for tag in add_tags or []:
+            if tag not in updated_event["tags"]:
+                updated_event["tags"].append(tag)
+        if updated_event == event:
+            return False
+        self._unindex(event_id, event)
+        self._events[event_id] = updated_event
+        self._index(event_id, updated_event)
+        return True
+
+    def _delete(self, event_id):
+        self._unindex(event_id, self._events.pop(event_id))
+        del self._ids[self._sequences.pop(event_id)]
+
+    def _ids_between(self, index: list, after=None, until=None):
+        # Event ids of a sorted (datetime, sequence) index within the (after, until] range
+        low = 0 if after is None else bisect_right(index, (after, float("inf")))
+        high = len(index) if until is None else bisect_right(index, (until, float("inf")))
+        return {self._ids[sequence] for _, sequence in index[low:high]}
+
+    def _ids_since(self, index: list, since):
+        # Event ids of a sorted (datetime, sequence) index from the since datetime (included)
+        return {self._ids[sequence] for _, sequence in index[bisect_left(index, (since, -1)):]}
+
+    def _candidate_ids(self, events_filter: EventsFilter):
+        """
+        Smallest known superset of the matching event ids, None when all the events must be checked
+        """
+        candidates = []
+        if events_filter.tags is not None:
+            tagged_events = set()
+            for tag in events_filter.tags:
+                tagged_events |= self._tags.get(tag, set())
+            candidates.append(tagged_events)
+        if events_filter.running_at is not None:
+            now = events_filter.running_at
+            started = bisect_right(self._starts, (now, float("inf")))
+            not_stopped = len(self._stops) - bisect_left(self._stops, (now, -1))
+            if started <= not_stopped + len(self._open_ended):
+                candidates.append(self._ids_between(self._starts, until=now) | self._series)
+            else:
+                candidates.append(self._ids_since(self._stops, now) | self._open_ended | self._series)
+        if events_filter.stopped_at is not None:
+            candidates.append(self._ids_between(self._stops, until=events_filter.stopped_at))
+        if events_filter.stale_series_at is not None or events_filter.recurring:
+            candidates.append(set(self._series))
+        if events_filter.changes_between is not None:
+            after, until = events_filter.changes_between
+            candidates.append(
+                self._ids_between(self._starts, after, until) | self._ids_between(self._stops, after, until) | self._series
+            )
+        if not candidates:
+            return None
+        return set.intersection(*candidates)
+
+    def _matching_ids(self, events_filter: EventsFilter):
+        candidate_ids = self._candidate_ids(events_filter)
+        if candidate_ids is None:
+            event_ids = iter(self._events)
+        else:
+            event_ids = sorted(candidate_ids, key=self._sequences.__getitem__)
+        return (event_id for event_id in event_ids if events_filter.matches(self._events[event_id]))
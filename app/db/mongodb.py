@@ -1,32 +1,103 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from app.config.settings import MONGO_URI, MONGO_DB
+from app.config.settings import (
+    MONGO_URI,
+    MONGO_DB,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_DELAY,
+    MONGO_CONNECT_MAX_DELAY,
+)
+from app.monitoring.mongodb_listeners import get_event_listeners
+from app.db.storage import get_retry_delay
 import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 class MongoDB:
     client: AsyncIOMotorClient = None
+    # Process which created the client: a Motor client cannot be shared with forked processes
+    pid: int = None
+    # Background connection task, and set when the server answered a ping
+    connect_task: asyncio.Task = None
+    connected: asyncio.Event = None
 
 mongodb = MongoDB()
 
-async def create_mongodb_connection(retries=10, delay=2):
-    for attempt in range(retries):
+def create_mongodb_client():
+    mongodb.client = AsyncIOMotorClient(
+        MONGO_URI,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=get_event_listeners()
+    )
+    mongodb.pid = os.getpid()
+
+async def create_mongodb_connection(delay=MONGO_CONNECT_DELAY, max_delay=MONGO_CONNECT_MAX_DELAY):
+    """
+    Create the client without waiting for the server: the client connects lazily, and a background
+    task pings the server (with an exponential backoff) until it answers, to set mongodb.connected
+    """
+    create_mongodb_client()
+    mongodb.connected = asyncio.Event()
+    mongodb.connect_task = asyncio.create_task(ping_mongodb(delay, max_delay))
+    logger.info("MongoDB client created")
+
+async def ping_mongodb(delay, max_delay):
+    attempt = 0
+    while True:
         try:
-            mongodb.client = AsyncIOMotorClient(MONGO_URI)
-            print("MongoDB connection created")
             await mongodb.client.admin.command("ping")
+            mongodb.connected.set()
+            logger.info("MongoDB connection created")
             return
         except Exception as e:
-            print(f"Cannot connect to mongodb because of {e}")
-            await asyncio.sleep(delay)
+            attempt += 1
+            retry_delay = get_retry_delay(attempt, delay, max_delay)
+            logger.warning("Cannot connect to mongodb because of %s, retrying in %.1f s", e, retry_delay, extra={"attempt": attempt})
+            await asyncio.sleep(retry_delay)
+
+def is_mongodb_connected():
+    return mongodb.connected is not None and mongodb.connected.is_set()
+
+async def wait_mongodb_connection():
+    if mongodb.connected is None:
+        raise RuntimeError("MongoDB is not connected")
+    await mongodb.connected.wait()
+
+async def ping_mongodb_server(timeout):
+    # False when the background connection has not succeeded yet or the server does not answer within timeout
+    if not is_mongodb_connected():
+        return False
+    try:
+        await asyncio.wait_for(mongodb.client.admin.command("ping"), timeout)
+        return True
+    except Exception as e:
+        logger.warning("MongoDB ping failed because of %s", e)
+        return False
+
+async def warm_up_mongodb_pool(size=MONGO_MIN_POOL_SIZE):
+    # Concurrent pings check out (and so open) size connections at once
+    await asyncio.gather(*(mongodb.client.admin.command("ping") for _ in range(size)))
 
 async def close_mongodb_connection():
+    if mongodb.connect_task:
+        mongodb.connect_task.cancel()
+        mongodb.connect_task = None
     if mongodb.client:
         try:
             mongodb.client.close()
-            print("MongoDB connection closed")
+            logger.info("MongoDB connection closed")
         except Exception as e:
-            print(f"Cannot close mongodb connection because of {e}")
+            logger.error("Cannot close mongodb connection because of %s", e)
+    mongodb.connected = None
 
 def get_db() -> AsyncIOMotorDatabase:
     if not mongodb.client:
         raise RuntimeError("MongoDB is not connected")
+    if mongodb.pid != os.getpid():
+        # Inherited from the parent process by a fork: this process gets its own client and connections
+        logger.info("Creating the MongoDB client of the forked process %s", os.getpid())
+        create_mongodb_client()
     return mongodb.client[MONGO_DB]
@@ -0,0 +1,199 @@
+import time
+from typing import List, Optional
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from app.db.mongodb import (
+    get_db,
+    create_mongodb_connection,
+    close_mongodb_connection,
+    wait_mongodb_connection,
+    ping_mongodb_server,
+    warm_up_mongodb_pool,
+)
+from app.db.storage import EventsStorage, EventsFilter
+from app.monitoring.slow_queries import record_query
+
+def build_query(events_filter: EventsFilter):
+    conditions = []
+    if events_filter.tags is not None:
+        conditions.append({"tags": {"$in": events_filter.tags}})
+    if events_filter.running_at is not None:
+        now = events_filter.running_at
+        conditions.append({
+            "$or": [
+                {"start": {"$lte": now}, "stop": {"$gte": now}},
+                {"start": {"$lte": now}, "$or": [{"stop": None}, {"stop": {"$exists": False}}]},
+                {"next_start": {"$lte": now}, "next_stop": {"$gt": now}}
+            ]
+        })
+    if events_filter.stopped_at is not None:
+        now = events_filter.stopped_at
+        conditions.append({
+            "$and": [
+                {"start": {"$lte": now}},
+                {"stop": {"$lte": now}},
+                {"$or": [{"recurrence": None}, {"series_stop": {"$lte": now}}]}
+            ]
+        })
+    if events_filter.stale_series_at is not None:
+        now = events_filter.stale_series_at
+        conditions.append({
+            "recurrence": {"$ne": None},
+            "next_stop": {"$lte": now},
+            "$or": [{"series_stop": None}, {"series_stop": {"$gt": now}}]
+        })
+    if events_filter.changes_between is not None:
+        after, until = events_filter.changes_between
+        conditions.append({
+            "$or": [
+                {"start": {"$gt": after, "$lte": until}},
+                {"stop": {"$gt": after, "$lte": until}},
+                {
+                    "recurrence": {"$ne": None},
+                    "start": {"$lte": until},
+                    "$or": [{"series_stop": None}, {"series_stop": {"$gt": after}}]
+                },
+            ]
+        })
+    if events_filter.recurring is not None:
+        conditions.append({"recurrence": {"$ne": None}} if events_filter.recurring else {"recurrence": None})
+    if not conditions:
+        return {}
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+def explain(command: dict):
+    # explain() of a command, run only if the operation is slow
+    return lambda: get_db().command({"explain": command, "verbosity": "executionStats"})
+
+class MongoEventsStorage(EventsStorage):
+    """
+    MongoDB events storage, using the Motor client of app.db.mongodb.
+    The operations are timed, the slow ones are logged by the slow query log.
+    """
+    @property
+    def collection(self):
+        return get_db()["events"]
+
+    async def open(self):
+        await create_mongodb_connection()
+
+    async def close(self):
+        await close_mongodb_connection()
+
+    async def wait_connection(self):
+        await wait_mongodb_connection()
+
+    async def ping(self, timeout: float):
+        return await ping_mongodb_server(timeout)
+
+    async def warm_up(self):
+        await warm_up_mongodb_pool()
+
+    async def create_indexes(self):
+        await self.collection.create_index([("start", ASCENDING), ("stop", ASCENDING)])
+        await self.collection.create_index("tags")
+        await self.collection.create_index("next_stop", sparse=True)
+
+    async def insert_event(self, document: dict):
+        new_event = await self.collection.insert_one(dict(document))
+        return str(new_event.inserted_id)
+
+    async def insert_events(self, documents: List[dict]):
+        new_events = await self.collection.insert_many([dict(document) for document in documents], ordered=False)
+        return [str(inserted_id) for inserted_id in new_events.inserted_ids]
+
+    async def get_event(self, event_id):
+        started = time.perf_counter()
+        event = await self.collection.find_one({"_id": event_id})
+        record_query("find_one", {"_id": event_id}, time.perf_counter() - started)
+        return event
+
+    async def get_events(self, event_ids: List):
+        query = {"_id": {"$in": list(event_ids)}}
+        started = time.perf_counter()
+        events = await self.collection.find(query).to_list(length=None)
+        record_query("find", query, time.perf_counter() - started, explain({"find": "events", "filter": query}))
+        return events
+
+    async def _find_events(self, events_filter: EventsFilter, skip: int, limit: Optional[int],
+                           fields: Optional[List[str]]):
+        query = build_query(events_filter)
+        # The projection keeps the unused fields in the database
+        projection = {"_id": 1, **{field: 1 for field in fields}} if fields is not None else None
+        cursor = self.collection.find(query, projection).skip(skip)
+        find_command = {"find": "events", "filter": query, "skip": skip}
+        if projection:
+            find_command["projection"] = projection
+        if limit is not None:
+            cursor = cursor.limit(limit)
+            find_command["limit"] = limit
+        # Only the time spent waiting for the database is measured, not the time spent by the caller
+        elapsed = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                event = await cursor.next()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
+            yield event
+        record_query("find", query, elapsed, explain(find_command))
+
+    async def count_events(self, events_filter: EventsFilter):
+        query = build_query(events_filter)
+        started = time.perf_counter()
+        count = await self.collection.count_documents(query)
+        record_query("count", query, time.perf_counter() - started, explain({"count": "events", "query": query}))
+        return count
+
+    async def update_event(self, event_id, set_fields: Optional[dict] = None, add_tags: Optional[List[str]] = None):
+        update_query = {}
+        if set_fields:
+            update_query["$set"] = set_fields
+        if add_tags:
+            update_query["$addToSet"] = {"tags": {"$each": add_tags}}
+        if not update_query:
+            return await self.get_event(event_id)
+        started = time.perf_counter()
+        updated_event = await self.collection.find_one_and_update(
+            {"_id": event_id},
+            update_query,
+            return_document=ReturnDocument.AFTER
+        )
+        record_query("find_one_and_update", {"_id": event_id}, time.perf_counter() - started)
+        return updated_event
+
+    async def update_events(self, events_filter: EventsFilter, set_fields: dict):
+        query = build_query(events_filter)
+        started = time.perf_counter()
+        result = await self.collection.update_many(query, {"$set": set_fields})
+        record_query("update_many", query, time.perf_counter() - started, explain({
+            "update": "events", "updates": [{"q": query, "u": {"$set": set_fields}, "multi": True}]
+        }))
+        return result.modified_count, result.matched_count
+
+    async def update_events_by_id(self, updates):
+        if updates:
+            started = time.perf_counter()
+            await self.collection.bulk_write(
+                [UpdateOne({"_id": event_id}, {"$set": set_fields}) for event_id, set_fields in updates],
+                ordered=False
+            )
+            record_query("bulk_write", {"_id": "?"}, time.perf_counter() - started)
+
+    async def delete_event(self, event_id):
+        started = time.perf_counter()
+        result = await self.collection.delete_one({"_id": event_id})
+        record_query("delete_one", {"_id": event_id}, time.perf_counter() - started)
+        return result.deleted_count > 0
+
+    async def delete_events(self, events_filter: EventsFilter):
+        query = build_query(events_filter)
+        started = time.perf_counter()
+        result = await self.collection.delete_many(query)
+        record_query("delete_many", query, time.perf_counter() - started, explain({
+            "delete": "events", "deletes": [{"q": query, "limit": 0}]
+        }))
+        return result.deleted_count
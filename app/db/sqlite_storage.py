@@ -0,0 +1,265 @@
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+from app.config.settings import SQLITE_PATH
+from app.db.storage import EventsStorage, EventsFilter, DATETIME_FIELDS, normalize_document, project_document
+
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    start TEXT NOT NULL,
+    stop TEXT,
+    next_start TEXT,
+    next_stop TEXT,
+    series_stop TEXT,
+    recurrence TEXT,
+    tags TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS event_tags (
+    tag TEXT NOT NULL,
+    event_seq INTEGER NOT NULL REFERENCES events(seq) ON DELETE CASCADE,
+    PRIMARY KEY (tag, event_seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS event_tags_event_seq ON event_tags (event_seq);
+CREATE INDEX IF NOT EXISTS events_start ON events (start);
+CREATE INDEX IF NOT EXISTS events_stop ON events (stop);
+CREATE INDEX IF NOT EXISTS events_next_stop ON events (next_stop) WHERE next_stop IS NOT NULL;
+"""
+
+COLUMNS = ("id", "start", "stop", "next_start", "next_stop", "series_stop", "recurrence", "tags")
+
+def format_datetime(value: Optional[datetime]):
+    return value.strftime(DATETIME_FORMAT) if value is not None else None
+
+def parse_datetime(value: Optional[str]):
+    return datetime.strptime(value, DATETIME_FORMAT) if value is not None else None
+
+def to_columns(document: dict):
+    # Values of the events table columns (except id) of a normalized document
+    columns = {field: format_datetime(document.get(field)) for field in DATETIME_FIELDS}
+    recurrence = document.get("recurrence")
+    if recurrence:
+        recurrence = dict(recurrence, until=format_datetime(recurrence.get("until")))
+    columns["recurrence"] = json.dumps(recurrence) if recurrence else None
+    columns["tags"] = json.dumps(document.get("tags") or [])
+    return columns
+
+def to_document(row: sqlite3.Row):
+    document = {"_id": ObjectId(row["id"])}
+    for field in DATETIME_FIELDS:
+        document[field] = parse_datetime(row[field])
+    recurrence = json.loads(row["recurrence"]) if row["recurrence"] else None
+    if recurrence:
+        recurrence["until"] = parse_datetime(recurrence.get("until"))
+    document["recurrence"] = recurrence
+    document["tags"] = json.loads(row["tags"])
+    # The series fields only exist on the recurring events, like in MongoDB
+    if not recurrence:
+        for field in ("next_start", "next_stop", "series_stop"):
+            del document[field]
+    return document
+
+def build_where(events_filter: EventsFilter):
+    conditions = []
+    parameters = []
+    if events_filter.tags is not None:
+        placeholders = ", ".join("?" for _ in events_filter.tags)
+        conditions.append(f"seq IN (SELECT event_seq FROM event_tags WHERE tag IN ({placeholders}))")
+        parameters += list(events_filter.tags)
+    if events_filter.running_at is not None:
+        now = format_datetime(events_filter.running_at)
+        conditions.append("((start <= ? AND (stop IS NULL OR stop >= ?)) OR (next_start <= ? AND next_stop > ?))")
+        parameters += [now, now, now, now]
+    if events_filter.stopped_at is not None:
+        now = format_datetime(events_filter.stopped_at)
+        conditions.append("(start <= ? AND stop <= ? AND (recurrence IS NULL OR series_stop <= ?))")
+        parameters += [now, now, now]
+    if events_filter.stale_series_at is not None:
+        now = format_datetime(events_filter.stale_series_at)
+        conditions.append("(recurrence IS NOT NULL AND next_stop <= ? AND (series_stop IS NULL OR series_stop > ?))")
+        parameters += [now, now]
+    if events_filter.changes_between is not None:
+        after, until = map(format_datetime, events_filter.changes_between)
+        conditions.append(
+            "((start > ? AND start <= ?) OR (stop > ? AND stop <= ?) OR "
+            "(recurrence IS NOT NULL AND start <= ? AND (series_stop IS NULL OR series_stop > ?)))"
+        )
+        parameters += [after, until, after, until, until, after]
+    if events_filter.recurring is not None:
+        conditions.append("recurrence IS NOT NULL" if events_filter.recurring else "recurrence IS NULL")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, parameters
+
+class SQLiteEventsStorage(EventsStorage):
+    """
+    SQLite events storage, for the small deployments without MongoDB server.
+    The queries run in a single dedicated thread, so they don't block the event loop
+    and the connection is never shared between threads.
+    """
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def open(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-storage")
+        await self._run(self._connect)
+
+    async def close(self):
+        if self._executor:
+            await self._run(self._connection.close)
+            self._executor.shutdown()
+            self._executor = None
+
+    def _connect(self):
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(SCHEMA)
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _insert(self, documents: List[dict]):
+        event_ids = []
+        with self._connection:
+            for document in documents:
+                event_id = str(document.get("_id") or ObjectId())
+                document = normalize_document(document)
+                columns = to_columns(document)
+                cursor = self._connection.execute(
+                    f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                    [event_id] + [columns[column] for column in COLUMNS[1:]]
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO event_tags (tag, event_seq) VALUES (?, ?)",
+                    [(tag, cursor.lastrowid) for tag in document.get("tags") or []]
+                )
+                event_ids.append(event_id)
+        return event_ids
+
+    async def insert_event(self, document: dict):
+        event_ids = await self._run(self._insert, [document])
+        return event_ids[0]
+
+    async def insert_events(self, documents: List[dict]):
+        return await self._run(self._insert, documents)
+
+    def _select(self, where: str, parameters: list):
+        rows = self._connection.execute(f"SELECT * FROM events {where} ORDER BY seq", parameters).fetchall()
+        return [to_document(row) for row in rows]
+
+    async def get_event(self, event_id):
+        events = await self._run(self._select, "WHERE id = ?", [str(event_id)])
+        return events[0] if events else None
+
+    def _select_ids(self, event_ids: List[str]):
+        # By chunks, below the SQLite variables limit
+        events = []
+        for index in range(0, len(event_ids), PAGE_SIZE):
+            chunk = event_ids[index:index + PAGE_SIZE]
+            events.extend(self._select(f"WHERE id IN ({', '.join('?' for _ in chunk)})", chunk))
+        return events
+
+    async def get_events(self, event_ids: List):
+        return await self._run(self._select_ids, [str(event_id) for event_id in event_ids])
+
+    def _select_page(self, where: str, parameters: list, after_seq: int, skip: int, limit: int):
+        # The (seq, document) of a page starting after the after_seq event
+        where = f"{where} AND seq > ?" if where else "WHERE seq > ?"
+        rows = self._connection.execute(
+            f"SELECT * FROM events {where} ORDER BY seq LIMIT ? OFFSET ?",
+            parameters + [after_seq, limit, skip]
+        ).fetchall()
+        return [(row["seq"], to_document(row)) for row in rows]
+
+    async def _find_events(self, events_filter: EventsFilter, skip: int, limit: Optional[int],
+                           fields: Optional[List[str]]):
+        # Reading by pages, so a large result is never loaded at once. The next pages start after
+        # the last seq read, instead of an OFFSET reading all the previous rows again
+        where, parameters = build_where(events_filter)
+        after_seq = 0
+        while limit is None or limit > 0:
+            page_size = PAGE_SIZE if limit is None else min(limit, PAGE_SIZE)
+            events = await self._run(self._select_page, where, parameters, after_seq, skip, page_size)
+            for _, event in events:
+                yield project_document(event, fields)
+            if len(events) < page_size:
+                return
+            after_seq, skip = events[-1][0], 0
+            if limit is not None:
+                limit -= page_size
+
+    async def count_events(self, events_filter: EventsFilter):
+        where, parameters = build_where(events_filter)
+        return await self._run(self._count, where, parameters)
+
+    def _count(self, where: str, parameters: list):
+        return self._connection.execute(f"SELECT COUNT(*) FROM events {where}", parameters).fetchone()[0]
+
+    def _update(self, where: str, parameters: list, set_fields: dict, add_tags: Optional[List[str]] = None):
+        """
+        Update the events matching the where clause, return (modified count, matched count)
+        """
+        matched = modified = 0
+        with self._connection:
+            for event in self._select(where, parameters):
+                matched += 1
+                updated_event = normalize_document(dict(event, **set_fields))
+                for tag in add_tags or []:
+                    if tag not in updated_event["tags"]:
+                        updated_event["tags"].append(tag)
+                if updated_event == event:
+                    continue
+                modified += 1
+                columns = to_columns(updated_event)
+                self._connection.execute(
+                    f"UPDATE events SET {', '.join(f'{column} = ?' for column in COLUMNS[1:])} WHERE id = ?",
+                    [columns[column] for column in COLUMNS[1:]] + [str(event["_id"])]
+                )
+                if updated_event["tags"] != event["tags"]:
+                    seq = self._connection.execute("SELECT seq FROM events WHERE id = ?", [str(event["_id"])]).fetchone()[0]
+                    self._connection.execute("DELETE FROM event_tags WHERE event_seq = ?", [seq])
+                    self._connection.executemany(
+                        "INSERT OR IGNORE INTO event_tags (tag, event_seq) VALUES (?, ?)",
+                        [(tag, seq) for tag in updated_event["tags"]]
+                    )
+        return modified, matched
+
+    async def update_event(self, event_id, set_fields: Optional[dict] = None, add_tags: Optional[List[str]] = None):
+        _, matched = await self._run(self._update, "WHERE id = ?", [str(event_id)], set_fields or {}, add_tags)
+        if not matched:
+            return None
+        return await self.get_event(event_id)
+
+    async def update_events(self, events_filter: EventsFilter, set_fields: dict):
+        where, parameters = build_where(events_filter)
+        return await self._run(self._update, where, parameters, set_fields)
+
+    def _update_by_id(self, updates):
+        for event_id, set_fields in updates:
+            self._update("WHERE id = ?", [str(event_id)], set_fields)
+
+    async def update_events_by_id(self, updates):
+        if updates:
+            await self._run(self._update_by_id, updates)
+
+    def _delete(self, where: str, parameters: list):
+        with self._connection:
+            return self._connection.execute(f"DELETE FROM events {where}", parameters).rowcount
+
+    async def delete_event(self, event_id):
+        return await self._run(self._delete, "WHERE id = ?", [str(event_id)]) > 0
+
+    async def delete_events(self, events_filter: EventsFilter):
+        where, parameters = build_where(events_filter)
+        return await self._run(self._delete, where, parameters)
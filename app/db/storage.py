@@ -0,0 +1,209 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from app.config.settings import STORAGE_BACKEND
+from app.models.events import to_naive_datetime
+
+DATETIME_FIELDS = ("start", "stop", "next_start", "next_stop", "series_stop")
+
+@dataclass
+class EventsFilter:
+    """
+    Filter of the events storage queries, all the given conditions must match.
+    - tags: events with at least one of the tags
+    - running_at: events (or current occurrence of recurring events) running at this datetime
+    - stopped_at: events stopped at this datetime, a recurring event is stopped when its series is over
+    - stale_series_at: recurring events whose precomputed next occurrence is over at this datetime
+    - changes_between: events starting or stopping within this (after, until] window
+    - recurring: only the recurring (True) or the non-recurring (False) events
+    """
+    tags: Optional[List[str]] = None
+    running_at: Optional[datetime] = None
+    stopped_at: Optional[datetime] = None
+    stale_series_at: Optional[datetime] = None
+    changes_between: Optional[Tuple[datetime, datetime]] = None
+    recurring: Optional[bool] = None
+
+    def matches(self, event: dict):
+        # Reference implementation of the filter, used by the in-memory backend
+        if self.tags is not None and set(self.tags).isdisjoint(event.get("tags") or []):
+            return False
+        start, stop = event.get("start"), event.get("stop")
+        next_start, next_stop = event.get("next_start"), event.get("next_stop")
+        recurring = bool(event.get("recurrence"))
+        series_stop = event.get("series_stop")
+        if self.recurring is not None and recurring != self.recurring:
+            return False
+        if self.running_at is not None:
+            now = self.running_at
+            running = start <= now and (stop is None or stop >= now)
+            running_occurrence = next_start is not None and next_start <= now < next_stop
+            if not (running or running_occurrence):
+                return False
+        if self.stopped_at is not None:
+            now = self.stopped_at
+            if not (start <= now and stop is not None and stop <= now):
+                return False
+            if recurring and (series_stop is None or series_stop > now):
+                return False
+        if self.stale_series_at is not None:
+            now = self.stale_series_at
+            if not (recurring and next_stop is not None and next_stop <= now):
+                return False
+            if series_stop is not None and series_stop <= now:
+                return False
+        if self.changes_between is not None:
+            after, until = self.changes_between
+            starting = after < start <= until
+            stopping = stop is not None and after < stop <= until
+            ongoing_series = recurring and start <= until and (series_stop is None or series_stop > after)
+            if not (starting or stopping or ongoing_series):
+                return False
+        return True
+
+def normalize_document(document: dict):
+    # The non-Mongo backends store the datetimes like MongoDB does (naive UTC)
+    document = dict(document)
+    for field in DATETIME_FIELDS:
+        if field in document:
+            document[field] = to_naive_datetime(document[field])
+    if document.get("recurrence"):
+        document["recurrence"] = dict(document["recurrence"])
+        document["recurrence"]["until"] = to_naive_datetime(document["recurrence"].get("until"))
+    if "tags" in document:
+        document["tags"] = list(document["tags"])
+    return document
+
+def project_document(document: dict, fields: Optional[List[str]]):
+    # Keeps only the "_id" and the given fields of a document, like a MongoDB projection
+    if fields is None:
+        return document
+    return {key: value for key, value in document.items() if key == "_id" or key in fields}
+
+async def no_events():
+    return
+    yield
+
+class EventsStorage:
+    """
+    Interface of the events storage backends, covering the operations used by events_crud.
+    The returned documents keep the MongoDB shape: the event id is in the "_id" field.
+    The events are returned in their insertion order.
+    """
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def wait_connection(self):
+        # Returns when the backend can serve requests
+        pass
+
+    async def ping(self, timeout: float) -> bool:
+        # True when the backend answers within timeout seconds
+        return True
+
+    async def warm_up(self):
+        pass
+
+    async def create_indexes(self):
+        pass
+
+    async def insert_event(self, document: dict) -> str:
+        raise NotImplementedError
+
+    async def insert_events(self, documents: List[dict]) -> List[str]:
+        raise NotImplementedError
+
+    async def get_event(self, event_id) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def get_events(self, event_ids: List) -> List[dict]:
+        # The existing events among event_ids, in any order
+        raise NotImplementedError
+
+    def find_events(self, events_filter: EventsFilter, skip: int = 0, limit: Optional[int] = None,
+                    fields: Optional[List[str]] = None) -> AsyncIterator[dict]:
+        """
+        The events matching the filter, after skipping skip of them and up to limit (None: no limit).
+        With fields, the documents only contain the "_id" and these fields.
+        The page is checked here, so every backend handles it the same way (MongoDB reads a negative limit
+        as a single batch, and a 0 limit as no limit).
+        """
+        if skip < 0 or (limit is not None and limit < 0):
+            raise ValueError(f"skip and limit must be positive, got skip={skip} and limit={limit}")
+        if limit == 0:
+            return no_events()
+        return self._find_events(events_filter, skip, limit, fields)
+
+    def _find_events(self, events_filter: EventsFilter, skip: int, limit: Optional[int],
+                     fields: Optional[List[str]]) -> AsyncIterator[dict]:
+        raise NotImplementedError
+
+    async def count_events(self, events_filter: EventsFilter) -> int:
+        raise NotImplementedError
+
+    async def update_event(self, event_id, set_fields: Optional[dict] = None, add_tags: Optional[List[str]] = None) -> Optional[dict]:
+        """
+        Update an event and return it after the update (None if it doesn't exist).
+        add_tags are appended to the event tags if they are not already present.
+        """
+        raise NotImplementedError
+
+    async def update_events(self, events_filter: EventsFilter, set_fields: dict) -> Tuple[int, int]:
+        """
+        Update all the events matching the filter and return (modified count, matched count)
+        """
+        raise NotImplementedError
+
+    async def update_events_by_id(self, updates: List[Tuple[object, dict]]):
+        """
+        Bulk update of the (event_id, set_fields) couples
+        """
+        raise NotImplementedError
+
+    async def delete_event(self, event_id) -> bool:
+        raise NotImplementedError
+
+    async def delete_events(self, events_filter: EventsFilter) -> int:
+        raise NotImplementedError
+
+def create_storage(backend: str = STORAGE_BACKEND) -> EventsStorage:
+    if backend == "mongodb":
+        from app.db.mongodb_storage import MongoEventsStorage
+        return MongoEventsStorage()
+    if backend == "memory":
+        from app.db.memory_storage import MemoryEventsStorage
+        return MemoryEventsStorage()
+    if backend == "sqlite":
+        from app.db.sqlite_storage import SQLiteEventsStorage
+        return SQLiteEventsStorage()
+    raise ValueError(f"Unknown storage backend {backend}, use mongodb, memory or sqlite")
+
+def get_retry_delay(attempt: int, delay: float, max_delay: float) -> float:
+    """
+    Exponential backoff with full jitter (so the workers don't retry at the same time).
+    The exponent is capped first, a long outage would overflow the float otherwise.
+    """
+    return random.uniform(0, min(max_delay, delay * 2 ** min(attempt, 32)))
+
+class Storage:
+    backend: EventsStorage = None
+
+storage = Storage()
+
+def set_storage(backend: EventsStorage):
+    storage.backend = backend
+
+def get_storage() -> EventsStorage:
+    if storage.backend is None:
+        storage.backend = create_storage()
+    return storage.backend
+
+async def open_storage():
+    await get_storage().open()
+
+async def close_storage():
+    await get_storage().close()
@@ -1,7 +1,20 @@
 from fastapi import FastAPI
+import asyncio
+import logging
+import signal
+import threading
 from contextlib import asynccontextmanager
-from app.routes import events_api
-from app.db.mongodb import create_mongodb_connection, close_mongodb_connection
+from app.routes import events_api, metrics_api, health_api
+from app.monitoring.metrics import MetricsMiddleware
+from app.monitoring.profiling import ProfilingMiddleware
+from app.routes.compression import CompressionMiddleware
+from app.crud import events_crud
+from app.db.storage import open_storage, close_storage, get_storage, get_retry_delay
+from app.notifications.events_notifier import events_notifier
+from app.config.logging_config import RequestIdMiddleware, setup_logging, stop_logging
+from app.config.settings import MONGO_CONNECT_DELAY, MONGO_CONNECT_MAX_DELAY
+
+logger = logging.getLogger("app.main")
 
 app = FastAPI(
     title="Events management API",
@@ -11,12 +24,90 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+async def create_indexes():
+    try:
+        await events_crud.create_events_indexes()
+        return True
+    except Exception as e:
+        logger.error("Cannot create the events indexes because of %s", e)
+        return False
+
+async def warm_up_storage():
+    try:
+        await get_storage().warm_up()
+        return True
+    except Exception as e:
+        logger.error("Cannot warm up the storage connections because of %s", e)
+        return False
+
+async def run_until_done(steps, delay, max_delay):
+    # Retries the failed steps with an exponential backoff, until all of them succeeded
+    attempt = 0
+    while steps:
+        results = await asyncio.gather(*(step() for step in steps))
+        steps = [step for step, done in zip(steps, results) if not done]
+        if steps:
+            attempt += 1
+            await asyncio.sleep(get_retry_delay(attempt, delay, max_delay))
+
+# Runs in the background once the storage is reachable, /readyz returns 200 when it is done
+async def warm_up(delay=MONGO_CONNECT_DELAY, max_delay=MONGO_CONNECT_MAX_DELAY):
+    await get_storage().wait_connection()
+    await asyncio.gather(run_until_done([create_indexes, warm_up_storage], delay, max_delay), events_notifier.start())
+    health_api.readiness.warmed_up = True
+    logger.info("Application ready")
+
+def close_streams_on_exit():
+    """
+    uvicorn only runs the shutdown hook once all the connections are closed, so the notification streams
+    would hold every shutdown until the graceful timeout: they are ended as soon as the exit signal arrives,
+    before the server signal handler runs.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous_handler = signal.getsignal(sig)
+
+        def handle_exit(signum, frame, previous_handler=previous_handler):
+            loop.call_soon_threadsafe(events_notifier.close_streams)
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+            elif previous_handler == signal.SIG_DFL:
+                signal.signal(signum, signal.SIG_DFL)
+                signal.raise_signal(signum)
+
+        signal.signal(sig, handle_exit)
+
+# The precomputed next occurrences of the recurring events are kept current in the background
+async def refresh_series():
+    await get_storage().wait_connection()
+    await events_crud.refresh_recurring_events_periodically()
+
 @app.on_event("startup")
 async def startup():
-    await create_mongodb_connection()
+    setup_logging()
+    await open_storage()
+    close_streams_on_exit()
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+    app.state.refresh_series_task = asyncio.create_task(refresh_series())
 
 @app.on_event("shutdown")
 async def shutdown():
-    await close_mongodb_connection()
+    app.state.warm_up_task.cancel()
+    app.state.refresh_series_task.cancel()
+    health_api.readiness.warmed_up = False
+    await events_notifier.stop()
+    await close_storage()
+    stop_logging()
+
+# Innermost, so the compression time is measured and profiled
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Outermost, so the logs of the other middlewares carry the request id
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(events_api.router, prefix="/events", tags=["Events"])
+app.include_router(metrics_api.router, tags=["Monitoring"])
+app.include_router(health_api.router, tags=["Monitoring"])
@@ -1,12 +1,54 @@
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel, Field, model_validator, field_validator
-from datetime import datetime
+from datetime import datetime, timezone
+from app.config.settings import GET_MANY_MAX_IDS
+
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d %H",
+    "%Y/%m/%d",
+]
+
+def parse_date_formats(date_value):
+    if isinstance(date_value, str):
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(date_value, fmt)
+            except ValueError:
+                continue
+    return date_value
+
+def to_naive_datetime(value: Optional[datetime]):
+    """
+    MongoDB stores timezone aware datetimes as naive UTC datetimes,
+    we do the same to compare the event datetimes in memory.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+# This model is used to define how an event is repeated
+class Recurrence(BaseModel):
+    frequency: Literal["hourly", "daily", "weekly"] = Field(..., description="Repetition frequency of the event", examples=["weekly"])
+    interval: int = Field(1, ge=1, description="Number of frequency units between two occurrences", examples=[2])
+    count: Optional[int] = Field(None, ge=1, description="Number of occurrences (Optional)", examples=[10])
+    until: Optional[datetime] = Field(None, description="Last possible occurrence start time (Optional)", examples=["2026-03-10 17:30"])
+
+    @field_validator("until", mode="before")
+    @classmethod
+    def date_formats_parsing(cls, date_value):
+        return parse_date_formats(date_value)
 
 # This model is used to create new event
 class EventCreate(BaseModel):
     start: datetime = Field(..., description="Event start time (Mandatory)", examples=[1717027200, "2025-02-10 21:30"])
     stop: Optional[datetime] | None = Field(None, description="Event stop time (Optional)", examples=[1725027200, "2026-03-10 17:30"])
     tags: List[str] = Field(..., description="List of tags of the event", examples=["database", "cloud"])
+    recurrence: Optional[Recurrence] = Field(None, description="Repetition rule of the event (Optional), start and stop define the first occurrence")
 
     @model_validator(mode='after')
     def check_stop_after_start(self):
@@ -15,25 +57,19 @@ class EventCreate(BaseModel):
                 raise ValueError('stop datetime must be after start datetime')
         return self
 
+    @model_validator(mode='after')
+    def check_recurrence_has_stop(self):
+        if self.recurrence and not self.stop:
+            raise ValueError('stop datetime is mandatory for recurring events')
+        if self.recurrence and self.recurrence.until:
+            if to_naive_datetime(self.recurrence.until) < to_naive_datetime(self.start):
+                raise ValueError('recurrence until datetime must be after start datetime')
+        return self
+
     @field_validator("start", "stop", mode="before")
     @classmethod
     def date_formats_parsing(cls, date_value):
-        if isinstance(date_value, str):
-            formats = [
-                "%Y-%m-%d %H:%M:%S",
-                "%Y-%m-%d %H:%M",
-                "%Y-%m-%d %H",
-                "%Y-%m-%d",
-                "%Y/%m/%d %H:%M",
-                "%Y/%m/%d %H",
-                "%Y/%m/%d",
-            ]
-            for fmt in formats:
-                try:
-                    return datetime.strptime(date_value, fmt)
-                except ValueError:
-                    continue
-        return date_value
+        return parse_date_formats(date_value)
 
 # This model is used to return a created event
 class EventOut(EventCreate):
@@ -41,10 +77,37 @@ class EventOut(EventCreate):
         description="MongoDB ObjectId of the event",
         examples=["6631c5d82fda6e60f14e2a3a"]
     )
+    next_start: Optional[datetime] = Field(None, description="Current or next occurrence start time of a recurring event")
+    next_stop: Optional[datetime] = Field(None, description="Current or next occurrence stop time of a recurring event")
+
+# The events fields which can be selected by the listing routes fields parameter (the id is always returned)
+EVENT_FIELDS = [field for field in EventOut.model_fields if field != "id"]
 
 # This model is used to return a list of events
 class EventResponseList(BaseModel):
     total: int
     skip: int
     limit: int
-    results: List[EventOut]
\ No newline at end of file
+    results: List[EventOut]
+
+# This model is used to return an occurrence of a recurring event
+class EventOccurrence(BaseModel):
+    start: datetime
+    stop: Optional[datetime] = None
+
+# This model is used to return the occurrences of an event within a time window
+class EventOccurrenceList(BaseModel):
+    id: str
+    skip: int
+    limit: int
+    results: List[EventOccurrence]
+
+# This model is used to get many events from their ids
+class EventIds(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=GET_MANY_MAX_IDS)
+
+# This model is used to return the events found from a list of ids, in the order of the ids
+class EventManyList(BaseModel):
+    total: int
+    results: List[EventOut]
+    not_found: List[str]
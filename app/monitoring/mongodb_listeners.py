@@ -0,0 +1,75 @@
+from pymongo import monitoring
+from app.monitoring.metrics import registry
+
+# Buckets (in seconds) of the MongoDB commands and pool checkout latencies
+MONGODB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+mongodb_commands_total = registry.counter(
+    "mongodb_commands_total", "Number of MongoDB commands", ("command", "status")
+)
+mongodb_command_duration_seconds = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB commands duration in seconds", ("command",), MONGODB_BUCKETS
+)
+mongodb_pool_checkout_wait_seconds = registry.histogram(
+    "mongodb_pool_checkout_wait_seconds", "Waiting time to check out a connection from the MongoDB pool", (), MONGODB_BUCKETS
+)
+mongodb_pool_checkout_failures_total = registry.counter(
+    "mongodb_pool_checkout_failures_total", "Number of failed MongoDB pool checkouts", ("reason",)
+)
+mongodb_pool_connections = registry.gauge(
+    "mongodb_pool_connections", "Number of open connections in the MongoDB pools"
+)
+mongodb_pool_checked_out_connections = registry.gauge(
+    "mongodb_pool_checked_out_connections", "Number of MongoDB connections in use"
+)
+
+class CommandMetricsListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongodb_commands_total.inc(event.command_name, "succeeded")
+        mongodb_command_duration_seconds.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        mongodb_commands_total.inc(event.command_name, "failed")
+        mongodb_command_duration_seconds.observe(event.duration_micros / 1e6, event.command_name)
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongodb_pool_connections.inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongodb_pool_connections.dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        mongodb_pool_checkout_failures_total.inc(str(event.reason))
+        mongodb_pool_checkout_wait_seconds.observe(event.duration)
+
+    def connection_checked_out(self, event):
+        mongodb_pool_checked_out_connections.inc()
+        mongodb_pool_checkout_wait_seconds.observe(event.duration)
+
+    def connection_checked_in(self, event):
+        mongodb_pool_checked_out_connections.dec()
+
+def get_event_listeners():
+    return [CommandMetricsListener(), PoolMetricsListener()]
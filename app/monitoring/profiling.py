@@ -0,0 +1,127 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import re
+from datetime import datetime
+from urllib.parse import parse_qs
+from app.config.settings import PROFILING_ENABLED, PROFILES_DIR, PROFILES_MAX_FILES
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_PARAMETER = "profile"
+STATS_LINES = 40
+
+def get_profile_mode(scope):
+    """
+    Profiling mode requested by the X-Profile header or the profile query parameter:
+    "text" returns the profile statistics instead of the response, any other value stores the profile.
+    """
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1").lower()
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get(PROFILE_PARAMETER)
+    return values[0].lower() if values else None
+
+def get_stats_text(profiler: cProfile.Profile):
+    stats_output = io.StringIO()
+    pstats.Stats(profiler, stream=stats_output).sort_stats("cumulative").print_stats(STATS_LINES)
+    return stats_output.getvalue()
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running the requests that ask for it under cProfile, when PROFILING_ENABLED is true.
+    The profile is stored in PROFILES_DIR (its file name is returned in the X-Profile-File header),
+    where only the max_files most recent profiles are kept, and can be returned as text.
+    The profiled requests run one at a time: the profiler covers the whole event loop thread, so the frames
+    of the other concurrent requests can appear in the profile. A streaming response (Server-Sent Events)
+    may never end, so it is only profiled until its first chunk and it is never returned as text.
+    """
+    def __init__(self, app, enabled: bool = PROFILING_ENABLED, profiles_dir: str = PROFILES_DIR,
+                 max_files: int = PROFILES_MAX_FILES):
+        self.app = app
+        self.enabled = enabled
+        self.profiles_dir = profiles_dir
+        self.max_files = max_files
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        profile_mode = get_profile_mode(scope) if self.enabled and scope["type"] == "http" else None
+        if profile_mode in (None, "", "0", "false"):
+            await self.app(scope, receive, send)
+            return
+        await self._profile(scope, receive, send, profile_mode)
+
+    async def _profile(self, scope, receive, send, profile_mode):
+        profile_file = self._get_file_name(scope)
+        profiler = cProfile.Profile()
+        # The response is only buffered when it is replaced by the profile statistics
+        messages = [] if profile_mode == "text" else None
+        profiling = True
+
+        async def stop_profiling():
+            # Stores the profile (off the event loop) and lets the next profiled request run
+            nonlocal profiling
+            if not profiling:
+                return
+            profiling = False
+            profiler.disable()
+            self._lock.release()
+            await asyncio.get_running_loop().run_in_executor(None, self._store_profile, profiler, profile_file)
+
+        async def profile_send(message):
+            nonlocal messages
+            if messages is not None and message["type"] == "http.response.body" and message.get("more_body"):
+                # A streaming response is sent as it is, after its buffered start
+                buffered_messages, messages = messages, None
+                for buffered_message in buffered_messages:
+                    await profile_send(buffered_message)
+            if messages is not None:
+                messages.append(message)
+                return
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-file", profile_file.encode())])
+            elif message.get("more_body") and profiling:
+                await stop_profiling()
+            await send(message)
+
+        await self._lock.acquire()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, profile_send)
+        finally:
+            await stop_profiling()
+
+        if messages is not None:
+            body = (await asyncio.get_running_loop().run_in_executor(None, get_stats_text, profiler)).encode()
+            status = messages[0]["status"] if messages else 500
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-file", profile_file.encode()),
+                    (b"x-profile-status", str(status).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+
+    def _store_profile(self, profiler: cProfile.Profile, profile_file: str):
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.profiles_dir, profile_file))
+        self._prune_profiles()
+
+    def _prune_profiles(self):
+        # The file names start with their timestamp, so the oldest profiles come first
+        profile_files = sorted(name for name in os.listdir(self.profiles_dir) if name.endswith(".prof"))
+        for name in profile_files[:max(len(profile_files) - self.max_files, 0)]:
+            try:
+                os.remove(os.path.join(self.profiles_dir, name))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _get_file_name(scope):
+        path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        return f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{scope['method']}-{path}.prof"
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+from app.config.settings import SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN, SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS, SLOW_QUERY_MAX_EXPLAINS
+from app.monitoring.metrics import registry
+
+slow_queries_logger = logging.getLogger("app.slow_queries")
+
+slow_queries_total = registry.counter(
+    "mongodb_slow_queries_total", "Number of database operations slower than the slow query threshold", ("operation",)
+)
+
+slow_queries_explain_skipped_total = registry.counter(
+    "mongodb_slow_queries_explain_skipped_total", "Number of slow queries logged without their explain()", ("reason",)
+)
+
+# References to the running explain tasks, so they are not garbage collected
+_explain_tasks = set()
+
+class ExplainLimiter:
+    """
+    Bounds the explain() load: when the database is saturated every operation becomes slow
+    (the connections pool wait is part of the elapsed time), and explaining all of them would double the load.
+    A filter shape is explained at most once per interval, and at most max_running explains run at once.
+    """
+    def __init__(self, interval: float = SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS, max_running: int = SLOW_QUERY_MAX_EXPLAINS):
+        self.interval = interval
+        self.max_running = max_running
+        self.running = 0
+        # (operation, filter shape) -> monotonic time of its last explain, the filter shapes are few
+        self._explained_at = {}
+
+    def acquire(self, operation: str, shape) -> bool:
+        if self.running >= self.max_running:
+            slow_queries_explain_skipped_total.inc("max_running")
+            return False
+        key = (operation, repr(shape))
+        now = time.monotonic()
+        explained_at = self._explained_at.get(key)
+        if explained_at is not None and now - explained_at < self.interval:
+            slow_queries_explain_skipped_total.inc("interval")
+            return False
+        self._explained_at[key] = now
+        self.running += 1
+        return True
+
+    def release(self):
+        self.running -= 1
+
+explain_limiter = ExplainLimiter()
+
+def get_query_shape(query):
+    """
+    Shape of a MongoDB filter: the values are replaced by "?", so the queries
+    of the same shape are logged the same way.
+    """
+    if isinstance(query, dict):
+        return {key: get_query_shape(value) for key, value in query.items()}
+    if isinstance(query, list):
+        if any(isinstance(value, dict) for value in query):
+            return [get_query_shape(value) for value in query]
+        return ["?"]
+    return "?"
+
+def get_plan_stages(plan: dict):
+    # Stages of a winning plan, from the root stage to the leaf stage: FETCH > IXSCAN(start_1_stop_1)
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        if "inputStages" in plan:
+            stages.append("[" + ", ".join(" > ".join(get_plan_stages(input_plan)) for input_plan in plan["inputStages"]) + "]")
+            break
+        plan = plan.get("inputStage")
+    return stages
+
+def get_explain_summary(explain: dict):
+    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # The slot based execution engine nests the plan in queryPlan
+    winning_plan = winning_plan.get("queryPlan", winning_plan)
+    execution_stats = explain.get("executionStats", {})
+    return {
+        "plan": " > ".join(get_plan_stages(winning_plan)),
+        "collection_scan": "COLLSCAN" in str(winning_plan),
+        "docs_examined": execution_stats.get("totalDocsExamined"),
+        "keys_examined": execution_stats.get("totalKeysExamined"),
+        "returned": execution_stats.get("nReturned"),
+        "execution_ms": execution_stats.get("executionTimeMillis"),
+    }
+
+def log_slow_query(operation: str, shape, elapsed_ms: float, summary: Optional[dict] = None):
+    slow_queries_logger.warning(
+        "Slow %s on events (%.1f ms) filter=%s explain=%s", operation, elapsed_ms, shape, summary,
+        extra={"operation": operation, "elapsed_ms": elapsed_ms, "filter_shape": shape, "explain": summary}
+    )
+
+async def explain_slow_query(operation: str, shape, elapsed_ms: float, explain: Callable[[], Awaitable[dict]]):
+    try:
+        summary = get_explain_summary(await explain())
+    except Exception as e:
+        summary = {"error": str(e)}
+    log_slow_query(operation, shape, elapsed_ms, summary)
+
+def record_query(operation: str, query: dict, elapsed: float, explain: Optional[Callable[[], Awaitable[dict]]] = None):
+    """
+    Record a database operation, the operations above the threshold are logged.
+    The explain() (when the explain_limiter allows it) runs in the background, so it doesn't slow down the request further.
+    """
+    elapsed_ms = elapsed * 1000
+    if SLOW_QUERY_MS < 0 or elapsed_ms < SLOW_QUERY_MS:
+        return
+    slow_queries_total.inc(operation)
+    shape = get_query_shape(query)
+    if explain is None or not SLOW_QUERY_EXPLAIN or not explain_limiter.acquire(operation, shape):
+        log_slow_query(operation, shape, elapsed_ms)
+        return
+    task = asyncio.get_running_loop().create_task(explain_slow_query(operation, shape, elapsed_ms, explain))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+    # Also released when the task is cancelled before it runs
+    task.add_done_callback(lambda _: explain_limiter.release())
@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from app.db.storage import get_storage, EventsFilter
+from app.monitoring.metrics import registry
+from app.crud.events_recurrence import iter_occurrences
+from app.config.settings import (
+    NOTIFIER_HORIZON_HOURS,
+    NOTIFIER_KEEPALIVE_SECONDS,
+    NOTIFIER_SUBSCRIBER_QUEUE_SIZE,
+    NOTIFIER_RELOAD_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Notification types pushed to the subscribers
+STARTED = "started"
+STOPPED = "stopped"
+CHANGED = "changed"
+DELETED = "deleted"
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# A subscriber is an idle connection waiting for notifications, it only holds a bounded queue
+class Subscriber:
+    def __init__(self, tags: Optional[List[str]] = None, queue_size: int = NOTIFIER_SUBSCRIBER_QUEUE_SIZE):
+        self.tags = set(tags) if tags else None
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def matches(self, event: Optional[dict]):
+        if self.tags is None or event is None:
+            return True
+        return not self.tags.isdisjoint(event.get("tags") or [])
+
+    def push(self, notification):
+        # A slow consumer loses its oldest notifications instead of growing the memory
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(notification)
+
+class EventsNotifier:
+    """
+    Pushes "started", "stopped", "changed" and "deleted" notifications to the subscribers.
+    The upcoming start/stop instants are kept in a timer heap, only for the events
+    starting or stopping within the horizon. The heap is loaded from the events collection,
+    reloaded periodically (every half horizon by default) and updated by the events_crud write functions.
+    The notifier lives in one worker process: it only sees the writes of the other workers at its next reload,
+    and never publishes their "changed" and "deleted" notifications.
+    """
+    def __init__(self, horizon_hours: float = NOTIFIER_HORIZON_HOURS, reload_seconds: float = NOTIFIER_RELOAD_SECONDS):
+        self.horizon = timedelta(hours=horizon_hours)
+        self.reload_seconds = reload_seconds if reload_seconds > 0 else self.horizon.total_seconds() / 2
+        self.subscribers = set()
+        # Heap entries are (instant, sequence, kind, event_id, version, occurrence)
+        self._heap = []
+        # Scheduled events: event_id -> [version, event, pending instants]. A heap entry with an old version is skipped
+        self._events = {}
+        self._versions = itertools.count()
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._timer_task: Optional[asyncio.Task] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        # While a load awaits the storage: event_id -> latest changed event (None when deleted), replayed after the load
+        self._load_changes: Optional[dict] = None
+        self._load_cleared = False
+        # The loads run one at a time, and the bulk updates share one pending reload
+        self._load_lock = asyncio.Lock()
+        self._pending_reload: Optional[asyncio.Task] = None
+        # Instants up to this one have been fired
+        self._fired_until: Optional[datetime] = None
+        # Set once the streams have been ended for the shutdown, the new streams end at once
+        self.closing = False
+
+    @staticmethod
+    def get_time_now():
+        return datetime.now()
+
+    def subscribe(self, tags: Optional[List[str]] = None):
+        subscriber = Subscriber(tags)
+        self.subscribers.add(subscriber)
+        if self.closing:
+            subscriber.push(None)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, kind: str, event: Optional[dict]):
+        notification = {"type": kind, "event": event, "at": self.get_time_now()}
+        for subscriber in self.subscribers:
+            if subscriber.matches(event):
+                subscriber.push(notification)
+
+    def schedule(self, event: dict):
+        """
+        (Re)schedule the start and stop instants of an event (of each occurrence for a recurring event),
+        the previous instants of the same event are invalidated.
+        The instants after the horizon will be scheduled by the next reload.
+        """
+        if self._load_changes is not None:
+            self._load_changes[event["id"]] = event
+        self._schedule(event, self.get_time_now(), self._heap, self._events)
+        if self._wakeup and self._heap and self._heap[0][3] == event["id"]:
+            self._wakeup.set()
+        self._compact()
+
+    def _schedule(self, event: dict, now: datetime, heap: list, events: dict):
+        event_id = event["id"]
+        events.pop(event_id, None)
+        limit = now + self.horizon
+        version = next(self._versions)
+        pending = 0
+        for occurrence in iter_occurrences(event, window_start=now, window_stop=limit):
+            for kind, instant in zip((STARTED, STOPPED), occurrence):
+                if instant is not None and now < instant <= limit:
+                    heapq.heappush(heap, (instant, next(self._sequence), kind, event_id, version, occurrence))
+                    pending += 1
+        if pending:
+            events[event_id] = [version, event, pending]
+
+    def unschedule(self, event_id: str):
+        if self._load_changes is not None:
+            self._load_changes[event_id] = None
+        self._events.pop(event_id, None)
+
+    def event_changed(self, event: dict):
+        self.schedule(event)
+        self.publish(CHANGED, event)
+
+    def event_deleted(self, event_id: str, event: Optional[dict] = None):
+        self.unschedule(event_id)
+        self.publish(DELETED, event)
+
+    def events_deleted(self):
+        # Bulk deletion, the subscribers should reload the events they are showing
+        self._heap.clear()
+        self._events.clear()
+        if self._load_changes is not None:
+            # The running load may have read deleted events, only the changes after this deletion are kept
+            self._load_changes.clear()
+            self._load_cleared = True
+        self.publish(DELETED, None)
+
+    def events_changed(self):
+        """
+        Bulk update, the subscribers should reload the events they are showing.
+        The events within the horizon are rescheduled by a reload in the background.
+        """
+        self.publish(CHANGED, None)
+        if self._pending_reload is None:
+            self._pending_reload = asyncio.get_running_loop().create_task(self._reload())
+
+    async def _reload(self):
+        async with self._load_lock:
+            # The bulk updates from now on need another reload
+            self._pending_reload = None
+            try:
+                await self._load()
+            except Exception as e:
+                logger.error("Cannot reload the upcoming events because of %s", e)
+
+    async def load(self):
+        async with self._load_lock:
+            await self._load()
+
+    async def _load(self):
+        """
+        Reloads the upcoming instants into a new heap, swapped in once the storage has been read:
+        the current heap keeps firing meanwhile, and the events changed during the load are scheduled again.
+        """
+        now = self.get_time_now()
+        heap, events = [], {}
+        self._load_changes, self._load_cleared = {}, False
+        try:
+            async for event in get_storage().find_events(EventsFilter(changes_between=(now, now + self.horizon))):
+                event["id"] = str(event.pop("_id"))
+                self._schedule(event, now, heap, events)
+            changes = self._load_changes
+            if self._load_cleared:
+                heap, events = [], {}
+        finally:
+            self._load_changes = None
+        # The instants fired by the current heap during the load are not fired again
+        while heap and self._fired_until is not None and heap[0][0] <= self._fired_until:
+            _, _, _, event_id, version, _ = heapq.heappop(heap)
+            scheduled = events.get(event_id)
+            if scheduled is not None and scheduled[0] == version:
+                scheduled[2] -= 1
+                if scheduled[2] == 0:
+                    del events[event_id]
+        self._heap, self._events = heap, events
+        for event_id, event in changes.items():
+            if event is not None:
+                self.schedule(event)
+            else:
+                self._events.pop(event_id, None)
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def start(self):
+        self.closing = False
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error("Cannot load the upcoming events because of %s", e)
+        self.start_timer()
+        self._reload_task = asyncio.create_task(self._reload_periodically())
+
+    def start_timer(self):
+        self._wakeup = asyncio.Event()
+        self._timer_task = asyncio.create_task(self._run_timer())
+
+    async def stop(self):
+        for task in (self._timer_task, self._reload_task, self._pending_reload):
+            if task:
+                task.cancel()
+        self._timer_task = self._reload_task = self._pending_reload = None
+        self.close_streams()
+
+    def close_streams(self):
+        """
+        Ends the open streams. The server waits for the open connections before running the application
+        shutdown, so this is called when the exit signal is received (see app.main), not only by stop().
+        """
+        self.closing = True
+        for subscriber in list(self.subscribers):
+            subscriber.push(None)
+
+    async def stream(self, subscriber: Subscriber, keepalive: float = NOTIFIER_KEEPALIVE_SECONDS):
+        """
+        Server-Sent Events stream of a subscriber, a comment is sent when there is no
+        notification during the keepalive delay to keep the connection open.
+        """
+        try:
+            yield ": subscribed\n\n"
+            while True:
+                try:
+                    notification = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if notification is None:
+                    return
+                data = json.dumps(notification, default=_json_default)
+                yield f"event: {notification['type']}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _compact(self):
+        # Dropping the invalidated entries when they become the majority of the heap
+        if len(self._heap) > 2 * len(self._events) + 64:
+            self._heap = [entry for entry in self._heap if self._is_valid(entry)]
+            heapq.heapify(self._heap)
+
+    def _is_valid(self, entry):
+        scheduled = self._events.get(entry[3])
+        return scheduled is not None and scheduled[0] == entry[4]
+
+    def _fire_due_instants(self):
+        now = self.get_time_now()
+        self._fired_until = now
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not self._is_valid(entry):
+                continue
+            _, _, kind, event_id, _, occurrence = entry
+            scheduled = self._events[event_id]
+            event = scheduled[1]
+            scheduled[2] -= 1
+            if scheduled[2] == 0:
+                del self._events[event_id]
+            if event.get("recurrence"):
+                event = dict(event, next_start=occurrence[0], next_stop=occurrence[1])
+            self.publish(kind, event)
+
+    async def _run_timer(self):
+        # wait_for can lose a cancellation racing with the wake up, stop() also detaches the task
+        while asyncio.current_task() is self._timer_task:
+            self._wakeup.clear()
+            self._fire_due_instants()
+            # Waking up at least every minute, in case the system clock has been changed
+            timeout = 60
+            if self._heap:
+                delay = (self._heap[0][0] - self.get_time_now()).total_seconds()
+                timeout = min(timeout, max(delay, 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reload_periodically(self):
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error("Cannot reload the upcoming events because of %s", e)
+
+events_notifier = EventsNotifier()
+
+registry.gauge(
+    "events_notifier_subscribers", "Number of subscribers to the events notifications",
+    function=lambda: len(events_notifier.subscribers)
+)
+registry.gauge(
+    "events_notifier_scheduled_events", "Number of events with start/stop instants in the notifier timer heap",
+    function=lambda: len(events_notifier._events)
+)
@@ -0,0 +1,134 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict
+from fastapi import HTTPException
+from app.monitoring.metrics import registry
+from app.config.settings import (
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_READ_LIMIT, ADMISSION_READ_QUEUE, ADMISSION_READ_TIMEOUT,
+    ADMISSION_WRITE_LIMIT, ADMISSION_WRITE_QUEUE, ADMISSION_WRITE_TIMEOUT,
+    ADMISSION_BULK_LIMIT, ADMISSION_BULK_QUEUE, ADMISSION_BULK_TIMEOUT,
+    ADMISSION_RETRY_AFTER,
+)
+
+# Route classes, by priority: the waiting reads are admitted before the writes, and the writes before the bulk operations
+READ = "read"
+WRITE = "write"
+BULK = "bulk"
+
+admission_in_flight = registry.gauge(
+    "admission_in_flight_requests", "Number of admitted requests being processed", ("route_class",)
+)
+admission_queue_depth = registry.gauge(
+    "admission_queue_depth", "Number of requests waiting to be admitted", ("route_class",)
+)
+admission_shed_total = registry.counter(
+    "admission_shed_requests_total", "Number of requests rejected with 503", ("route_class", "reason")
+)
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+@dataclass
+class RouteClass:
+    name: str
+    priority: int
+    limit: int
+    queue_size: int
+    timeout: float
+    in_flight: int = 0
+    waiters: deque = field(default_factory=deque)
+
+class AdmissionController:
+    """
+    Limits the concurrent requests of each route class, and all together (to protect the MongoDB pool).
+    The requests above the limits wait in a bounded queue until their deadline, the freed slots
+    go to the waiting requests of the highest priority class which has room under its own limit.
+    A request is rejected (Overloaded) when its class queue is full or its deadline is reached.
+    """
+    def __init__(self, max_concurrency: int, route_classes: Dict[str, RouteClass]):
+        self.max_concurrency = max_concurrency
+        self.route_classes = route_classes
+        self.in_flight = 0
+
+    def _has_room(self, route_class: RouteClass):
+        return route_class.in_flight < route_class.limit and self.in_flight < self.max_concurrency
+
+    def _admit(self, route_class: RouteClass):
+        route_class.in_flight += 1
+        self.in_flight += 1
+        admission_in_flight.set(route_class.in_flight, route_class.name)
+
+    async def acquire(self, name: str):
+        route_class = self.route_classes[name]
+        # The freed slots are always given to the waiters first, so a free slot means there is no eligible waiter
+        if self._has_room(route_class):
+            self._admit(route_class)
+            return
+        if len(route_class.waiters) >= route_class.queue_size:
+            raise Overloaded("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        route_class.waiters.append(waiter)
+        admission_queue_depth.set(len(route_class.waiters), name)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), route_class.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted at the same time: give the slot back
+                self.release(name)
+            else:
+                waiter.cancel()
+                route_class.waiters.remove(waiter)
+                admission_queue_depth.set(len(route_class.waiters), name)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded("timeout")
+            raise
+
+    def release(self, name: str):
+        route_class = self.route_classes[name]
+        route_class.in_flight -= 1
+        self.in_flight -= 1
+        admission_in_flight.set(route_class.in_flight, name)
+        self._wake_up()
+
+    def _wake_up(self):
+        for route_class in sorted(self.route_classes.values(), key=lambda route_class: route_class.priority):
+            while route_class.waiters and self._has_room(route_class):
+                self._admit(route_class)
+                route_class.waiters.popleft().set_result(None)
+            admission_queue_depth.set(len(route_class.waiters), route_class.name)
+
+admission_controller = AdmissionController(ADMISSION_MAX_CONCURRENCY, {
+    READ: RouteClass(READ, 0, ADMISSION_READ_LIMIT, ADMISSION_READ_QUEUE, ADMISSION_READ_TIMEOUT),
+    WRITE: RouteClass(WRITE, 1, ADMISSION_WRITE_LIMIT, ADMISSION_WRITE_QUEUE, ADMISSION_WRITE_TIMEOUT),
+    BULK: RouteClass(BULK, 2, ADMISSION_BULK_LIMIT, ADMISSION_BULK_QUEUE, ADMISSION_BULK_TIMEOUT),
+})
+
+def admission(name: str):
+    """
+    Route dependency admitting the request in its route class, or failing fast with 503 and Retry-After:
+    @router.get("/list_events/", dependencies=[Depends(admission(READ))])
+    """
+    async def admit():
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        try:
+            await admission_controller.acquire(name)
+        except Overloaded as e:
+            admission_shed_total.inc(name, e.reason)
+            raise HTTPException(
+                status_code=503,
+                detail=f"The server is overloaded ({name} requests), please retry later",
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)}
+            )
+        try:
+            yield
+        finally:
+            admission_controller.release(name)
+    return admit
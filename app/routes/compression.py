@@ -0,0 +1,124 @@
+import zlib
+from app.config.settings import COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_ZSTD_LEVEL
+
+# zstd is only offered when the optional zstandard package is installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The streams are sent as they are produced, they are not compressed
+EXCLUDED_CONTENT_TYPES = (b"text/event-stream",)
+
+def get_encoding(scope, encodings):
+    """
+    Preferred encoding among encodings from the Accept-Encoding header (with its q values), or None.
+    On equal q values, the first of encodings is chosen.
+    """
+    accept_encoding = b""
+    for name, value in scope.get("headers", []):
+        if name == b"accept-encoding":
+            accept_encoding = value
+            break
+    weights = {}
+    for item in accept_encoding.decode("latin-1").lower().split(","):
+        coding, _, parameters = item.strip().partition(";")
+        weight = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                weight = float(parameters.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip()] = weight
+    best_encoding, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best_encoding, best_weight = encoding, weight
+    return best_encoding
+
+def add_vary(headers):
+    # Adds Accept-Encoding to the Vary header of the response, without duplicating it
+    for index, (name, value) in enumerate(headers):
+        if name == b"vary":
+            tokens = [token.strip().lower() for token in value.split(b",")]
+            if b"accept-encoding" not in tokens and b"*" not in tokens:
+                headers[index] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int, zstd_level: int):
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self._flush = lambda: self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+        else:
+            # wbits=31: gzip container
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._flush = self._compressor.flush
+
+    def compress(self, data: bytes, finish: bool):
+        compressed = self._compressor.compress(data)
+        return compressed + self._flush() if finish else compressed
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing the responses larger than minimum_size with zstd or gzip, as negotiated
+    with the Accept-Encoding header. The small responses, the already encoded ones and the
+    Server-Sent Events streams are sent as they are.
+    """
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 gzip_level: int = COMPRESSION_GZIP_LEVEL, zstd_level: int = COMPRESSION_ZSTD_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.encodings = ("zstd", "gzip") if zstandard else ("gzip",)
+
+    async def __call__(self, scope, receive, send):
+        encoding = get_encoding(scope, self.encodings) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def compress_send(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                passthrough = b"content-encoding" in headers or content_type.startswith(EXCLUDED_CONTENT_TYPES)
+                if passthrough:
+                    await send(message)
+                else:
+                    # Held until the first body message, to know if the response is large enough
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if start_message is not None:
+                response_start, start_message = start_message, None
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(response_start)
+                    await send(message)
+                    return
+                compressor = Compressor(encoding, self.gzip_level, self.zstd_level)
+                headers = [(name, value) for name, value in response_start.get("headers", []) if name != b"content-length"]
+                headers = add_vary(headers + [(b"content-encoding", encoding.encode())])
+                compressed_body = compressor.compress(body, finish=not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed_body)).encode()))
+                await send(dict(response_start, headers=headers))
+                await send({"type": "http.response.body", "body": compressed_body, "more_body": more_body})
+                return
+            await send({"type": "http.response.body", "body": compressor.compress(body, finish=not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, compress_send)
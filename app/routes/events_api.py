@@ -1,16 +1,51 @@
 from datetime import datetime
 from fastapi import APIRouter, Query, Path, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from app.models.events import EventCreate, EventOut, EventResponseList
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.convertors import Convertor, register_url_convertor
+from fastapi.encoders import jsonable_encoder
+from app.models.events import EventCreate, EventOut, EventResponseList, EventOccurrenceList, EventIds, EventManyList, EVENT_FIELDS
 from typing import Optional, List
 from app.crud import events_crud
+from app.notifications.events_notifier import events_notifier
+from app.routes.admission import admission, READ, WRITE, BULK
 import asyncio
 
+# The events ids paths only match MongoDB ObjectIds, so the other routes paths without their
+# trailing slash are still redirected
+class ObjectIdConvertor(Convertor):
+    regex = "[0-9a-fA-F]{24}"
+
+    def convert(self, value: str) -> str:
+        return value
+
+    def to_string(self, value: str) -> str:
+        return str(value)
+
+register_url_convertor("objectid", ObjectIdConvertor())
+
 router = APIRouter()
 
+# Sparse fieldsets of the listing routes: fields=start,tags (or fields=start&fields=tags)
+def get_fields(
+    fields: Optional[List[str]] = Query(None, description=f"Only return the id and these fields of the events, among {', '.join(EVENT_FIELDS)}")
+):
+    if fields is None:
+        return None
+    selected_fields = {field.strip() for value in fields for field in value.split(",") if field.strip()}
+    unknown_fields = selected_fields - set(EVENT_FIELDS) - {"id"}
+    if unknown_fields:
+        raise HTTPException(status_code=422, detail=f"Unknown fields {sorted(unknown_fields)}, the fields are {EVENT_FIELDS}")
+    return [field for field in EVENT_FIELDS if field in selected_fields]
+
+# The listings with a fields selection don't match EventResponseList, they are returned without response_model
+def get_fields_response(events_list: dict):
+    return JSONResponse(content=jsonable_encoder(events_list))
+
 # Add new event
 @router.post(
     "/add_event/",
+    dependencies=[Depends(admission(WRITE))],
     summary="Create a new event",
     description="Creating new event, by giving a start datetime and a set of tags. stop datetime is optional",
     response_model=EventOut
@@ -26,15 +61,19 @@ async def add_event(event: EventCreate):
 # Get the list of all events
 @router.get(
     "/list_events/",
+    dependencies=[Depends(admission(READ))],
     summary="List all events",
     description="Listing all events. To specify how many events you would like to get, you can use skip and limit parameters",
     response_model=EventResponseList
 )
 async def list_events(
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    fields: Optional[List[str]] = Depends(get_fields)
 ):
     try:
+        if fields is not None:
+            return get_fields_response(await events_crud.get_all_events(skip, limit, fields=fields))
         events_list_from_db = await events_crud.get_all_events(skip, limit)
         return events_list_from_db
     except Exception as e:
@@ -43,15 +82,19 @@ async def list_events(
 # Get the list of running events
 @router.get(
     "/running_events/",
+    dependencies=[Depends(admission(READ))],
     summary="List all running events",
     description="Listing all running events. You can use skip and limit parameters, to specify the number of returned events",
     response_model=EventResponseList
 )
 async def list_running_events(
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    fields: Optional[List[str]] = Depends(get_fields)
 ):
     try:
+        if fields is not None:
+            return get_fields_response(await events_crud.get_running_events(skip, limit, fields=fields))
         events_list_from_db = await events_crud.get_running_events(skip, limit)
         return events_list_from_db
     except Exception as e:
@@ -60,6 +103,7 @@ async def list_running_events(
 # Search events by tags
 @router.get(
     "/search_events/",
+    dependencies=[Depends(admission(READ))],
     summary="Searching events based on tags",
     description="Searching the list of events which contain a specific list of tags",
     response_model=EventResponseList
@@ -67,17 +111,63 @@ async def list_running_events(
 async def search_events(
     tags: List[str] = Query(...),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    fields: Optional[List[str]] = Depends(get_fields)
 ):
     try:
+        if fields is not None:
+            return get_fields_response(await events_crud.search_event(tags, skip, limit, fields=fields))
         events_db_list = await events_crud.search_event(tags, skip, limit)
         return events_db_list
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Cannot find events, because of: {str(e)}")
 
+# Get many events by id
+@router.post(
+    "/get_many",
+    dependencies=[Depends(admission(READ))],
+    summary="Get many events by id",
+    description="Getting the events of a list of ids (in the order of the ids), with a single database query for the events which are not cached. "
+                "The ids of the events which don't exist are returned in not_found",
+    response_model=EventManyList
+)
+async def get_many_events(event_ids: EventIds):
+    try:
+        events = await events_crud.get_many_events(event_ids.ids)
+        return events
+    except StarletteHTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Cannot get events, because of: {str(e)}")
+
+# Get the occurrences of an event
+@router.get(
+    "/occurrences/{event_id}/",
+    dependencies=[Depends(admission(READ))],
+    summary="List the occurrences of an event",
+    description="Listing the occurrences of a recurring event within a time window. "
+                "The occurrences are expanded only for the requested window, you can use skip and limit parameters",
+    response_model=EventOccurrenceList
+)
+async def list_event_occurrences(
+    event_id: str = Path(...),
+    start: datetime = Query(None, description="Window start datetime"),
+    stop: datetime = Query(None, description="Window stop datetime"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100)
+):
+    try:
+        occurrences = await events_crud.get_event_occurrences(event_id, start, stop, skip, limit)
+        return occurrences
+    except StarletteHTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Cannot get occurrences of event {event_id}, because of: {str(e)}")
+
 # Deleting event from ID
 @router.delete(
     "/delete_event/{event_id}",
+    dependencies=[Depends(admission(WRITE))],
     summary="Deleting an event",
     description="Deleting an event by ID. If the event is running, it will be deleted only if `force_delete=true`",
 )
@@ -103,6 +193,7 @@ async def delete_event(
 # Deleting all events
 @router.delete(
     "/delete_all_events/",
+    dependencies=[Depends(admission(BULK))],
     summary = "Deleting all events",
     description = "Deleting all events. If there is some running events, they will be deleted only if `force_delete=true`",
 )
@@ -136,6 +227,7 @@ async def delete_all_events(
 
 @router.patch(
     "/update_event_tags/{event_id}/",
+    dependencies=[Depends(admission(WRITE))],
     summary = "Updating event tags",
     description = "Updating or replacing event tags. The event tags can be replaced by the new tags if `replace=true`",
     response_model=EventOut
@@ -153,6 +245,7 @@ async def update_event_tags(
 
 @router.patch(
     "/update_event_datetime/{event_id}/",
+    dependencies=[Depends(admission(WRITE))],
     summary = "Updating event datetime (start and stop)",
     description = "Updating event start and stop datetime",
     response_model=EventOut
@@ -165,11 +258,14 @@ async def update_event_datetime(
     try:
        updated_event = await events_crud.updating_event_datetime(event_id=event_id, start=start, stop=stop)
        return updated_event
+    except StarletteHTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Cannot update event datetime {event_id}, because of: {str(e)}")
 
 @router.patch(
     "/update_events_datetime_by_tags",
+    dependencies=[Depends(admission(BULK))],
     summary = "Updating events datetime based on tags",
     description = "Updating events stop and start times based on tags",
 )
@@ -195,5 +291,42 @@ async def update_events_datetime_by_tags(
                status_code=404,
                content=f"There is no events to update with the tags {tags}"
            )
+    except StarletteHTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Cannot update events, because of: {str(e)}")
+
+
+# Subscribing to events start/stop notifications
+@router.get(
+    "/subscribe/",
+    summary="Subscribe to events notifications",
+    description="Server-Sent Events stream of the `started`, `stopped`, `changed` and `deleted` events notifications. "
+                "You can use the tags parameter to receive only the notifications of events with at least one of these tags",
+)
+async def subscribe_events(
+    tags: Optional[List[str]] = Query(None, description="Only notify the events with at least one of these tags")
+):
+    subscriber = events_notifier.subscribe(tags)
+    return StreamingResponse(
+        events_notifier.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Get an event by id
+@router.get(
+    "/{event_id:objectid}",
+    dependencies=[Depends(admission(READ))],
+    summary="Get an event by id",
+    description="Getting an event from its ID",
+    response_model=EventOut
+)
+async def get_event(event_id: str = Path(...)):
+    try:
+        event = await events_crud.get_event_by_id(event_id)
+        return event
+    except StarletteHTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Cannot get event {event_id}, because of: {str(e)}")
@@ -0,0 +1,44 @@
+import time
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.db.storage import get_storage
+from app.config.settings import READINESS_PING_TIMEOUT, READINESS_CACHE_SECONDS
+
+router = APIRouter()
+
+class Readiness:
+    # Set when the startup work (indexes, pool warm-up, notifications) is done
+    warmed_up: bool = False
+    # Result of the last database ping, and its monotonic time
+    database: bool = False
+    checked_at: float = None
+
+readiness = Readiness()
+
+async def check_database():
+    # The probes within READINESS_CACHE_SECONDS reuse the last ping result
+    now = time.monotonic()
+    if readiness.checked_at is None or now - readiness.checked_at >= READINESS_CACHE_SECONDS:
+        readiness.database = await get_storage().ping(READINESS_PING_TIMEOUT)
+        readiness.checked_at = time.monotonic()
+    return readiness.database
+
+# Liveness probe
+@router.get(
+    "/healthz",
+    summary="Liveness probe",
+    description="Returns 200 while the application process is able to answer, even when the database is not reachable",
+)
+async def healthz():
+    return {"status": "alive"}
+
+# Readiness probe
+@router.get(
+    "/readyz",
+    summary="Readiness probe",
+    description="Returns 200 when the database is reachable and the startup work (indexes, connections pool warm-up) is done, else 503",
+)
+async def readyz():
+    checks = {"database": await check_database(), "warmed_up": readiness.warmed_up}
+    ready = all(checks.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"status": "ready" if ready else "not ready", **checks})
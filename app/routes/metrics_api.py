@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.monitoring.metrics import registry
+
+router = APIRouter()
+
+# Prometheus metrics
+@router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description="Requests count and latency per route, MongoDB commands duration and pool metrics, in Prometheus text format",
+    response_class=PlainTextResponse
+)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,68 @@
+"""
+Production server: runs the application in N uvicorn worker processes, with uvloop and httptools when they are installed.
+
+    python -m app.serve --workers 4 --port 8000
+
+Each worker imports the application and runs its startup, so it creates its own storage (Motor client) after the fork.
+The in-memory storage is not shared between processes, so it always runs a single worker. With several workers,
+the notifications of each worker only reload the events written through the others every NOTIFIER_RELOAD_SECONDS.
+On SIGTERM/SIGINT the workers stop accepting connections and drain the running requests for up to --graceful_timeout seconds.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import uvicorn
+from app.config.settings import SERVE_HOST, SERVE_PORT, SERVE_WORKERS, SERVE_GRACEFUL_TIMEOUT, STORAGE_BACKEND
+from app.config.logging_config import setup_logging, stop_logging
+
+logger = logging.getLogger("app.serve")
+
+# Notifications reload delay of the workers when there are several of them (unless NOTIFIER_RELOAD_SECONDS is set)
+MULTI_WORKERS_RELOAD_SECONDS = "60"
+
+def get_loop():
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+def get_http():
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+def get_workers(workers: int, storage_backend: str = STORAGE_BACKEND):
+    # Each worker would have its own events with the in-memory storage
+    if storage_backend == "memory":
+        return 1
+    return workers if workers > 0 else os.cpu_count() or 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the events management API with several worker processes")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="Number of worker processes (0: the CPU count)")
+    parser.add_argument("--graceful_timeout", type=float, default=SERVE_GRACEFUL_TIMEOUT, help="Requests drain timeout on shutdown")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        workers = get_workers(args.workers)
+        if workers != args.workers and STORAGE_BACKEND == "memory":
+            logger.warning("The memory storage backend runs a single worker")
+        if workers > 1:
+            # The workers inherit the environment
+            os.environ.setdefault("NOTIFIER_RELOAD_SECONDS", MULTI_WORKERS_RELOAD_SECONDS)
+        logger.info("Serving on %s:%s with %s workers (loop=%s, http=%s)", args.host, args.port, workers, get_loop(), get_http(),
+                    extra={"workers": workers})
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            loop=get_loop(),
+            http=get_http(),
+            timeout_graceful_shutdown=args.graceful_timeout,
+        )
+    finally:
+        # Also stopped by the application shutdown when it runs in this process
+        stop_logging()
+
+if __name__ == "__main__":
+    main()
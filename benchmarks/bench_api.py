@@ -0,0 +1,192 @@
+"""
+Throughput and tail latency benchmark of the events API routes.
+
+Each route is driven at fixed concurrency levels, in-process through httpx.ASGITransport (asgi mode)
+and through a real uvicorn process on the loopback interface (uvicorn mode).
+The results (p50/p95/p99 latencies and requests per second) are written as JSON,
+to compare them between commits with benchmarks/compare.py.
+
+    python -m benchmarks.bench_api --backend memory --sizes 1000 100000 --concurrency 1 10 50 --output bench.json
+
+The memory backend is an in-process stand-in of MongoDB, the mongodb backend uses the database
+of the .env file (its events are deleted by the seeding).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TAGS = ["tag0", "tag1", "tag2", "tag3", "tag4"]
+
+# Route name -> function building (method, url, json body) of the request number i
+ROUTES = {
+    "list_events": lambda ids, i: ("GET", "/events/list_events/?skip=0&limit=100", None),
+    "running_events": lambda ids, i: ("GET", "/events/running_events/?skip=0&limit=100", None),
+    "search_events": lambda ids, i: ("GET", f"/events/search_events/?tags={TAGS[i % len(TAGS)]}&limit=100", None),
+    "update_event_tags": lambda ids, i: ("PATCH", f"/events/update_event_tags/{ids[i % len(ids)]}/?tags=benchmark", None),
+    "add_event": lambda ids, i: ("POST", "/events/add_event/", {"start": "2030-01-01 12:00", "tags": ["benchmark"]}),
+}
+DEFAULT_ROUTES = ["list_events", "running_events", "search_events", "update_event_tags"]
+
+def percentile(sorted_values, percent):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+    }
+
+async def drive(client, route, event_ids, concurrency, requests):
+    """
+    Sends the requests with a fixed number of concurrent workers
+    """
+    build_request = ROUTES[route]
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, body = build_request(event_ids, i)
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def run_routes(client, args, mode, size):
+    response = await client.get("/events/list_events/?skip=0&limit=100")
+    event_ids = [event["id"] for event in response.json()["results"]]
+    results = []
+    for route in args.routes:
+        for concurrency in args.concurrency:
+            # Warm-up requests are not measured
+            await drive(client, route, event_ids, concurrency, min(args.requests, 10 * concurrency))
+            result = await drive(client, route, event_ids, concurrency, args.requests)
+            result.update({"mode": mode, "size": size, "route": route, "concurrency": concurrency})
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+    return results
+
+async def run_asgi(args, size):
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.db.storage import open_storage, close_storage
+    from benchmarks.dataset import seed_events
+    await open_storage()
+    try:
+        await seed_events(size, args.seed)
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            return await run_routes(client, args, "asgi", size)
+    finally:
+        await close_storage()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def wait_until_ready(client, server, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("The benchmark server has stopped")
+        try:
+            response = await client.get("/events/list_events/?skip=0&limit=1")
+            if response.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("The benchmark server is not ready")
+
+async def run_uvicorn(args, size):
+    import httpx
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.server", "--size", str(size), "--seed", str(args.seed), "--port", str(port)],
+        env=os.environ.copy()
+    )
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_until_ready(client, server)
+            return await run_routes(client, args, "uvicorn", size)
+    finally:
+        server.terminate()
+        server.wait()
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the events API routes")
+    parser.add_argument("--backend", default="memory", choices=["memory", "sqlite", "mongodb"], help="Events storage backend")
+    parser.add_argument("--modes", nargs="+", default=["asgi", "uvicorn"], choices=["asgi", "uvicorn"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000], help="Seeded dataset sizes")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per route and concurrency level")
+    parser.add_argument("--routes", nargs="+", default=DEFAULT_ROUTES, choices=list(ROUTES),
+                        help="Benchmarked routes (add_event includes a 1 second delay)")
+    parser.add_argument("--seed", type=int, default=0, help="Dataset random seed")
+    parser.add_argument("--output", default=None, help="JSON results file (stdout by default)")
+    args = parser.parse_args()
+
+    # The settings are read when the application is imported, so they are set before
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "sqlite" and "SQLITE_PATH" not in os.environ:
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+    results = []
+    for size in args.sizes:
+        if "asgi" in args.modes:
+            results += asyncio.run(run_asgi(args, size))
+        if "uvicorn" in args.modes:
+            results += asyncio.run(run_uvicorn(args, size))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "requests": args.requests,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Micro-benchmarks of the events validation and serialization, written as JSON.
+
+    python -m benchmarks.bench_models --output models.json
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime
+from bson import ObjectId
+from app.crud.events_crud import get_event_out
+from app.models.events import EventCreate
+
+EVENT_DOCUMENT = {
+    "_id": ObjectId(),
+    "start": datetime(2024, 4, 1, 12),
+    "stop": datetime(2025, 8, 1, 10),
+    "tags": ["Hello", "Test", "Cloud"],
+    "recurrence": None,
+}
+
+BENCHMARKS = {
+    "event_create_iso": lambda: EventCreate(start="2024-04-01T12:00:00", stop="2025-08-01T10:00:00", tags=["Hello", "Test"]),
+    "event_create_custom_format": lambda: EventCreate(start="2024/04/01 12", stop="2025/08/01", tags=["Hello", "Test"]),
+    "event_create_timestamp": lambda: EventCreate(start=1717027200, stop=1725027200, tags=["Hello", "Test"]),
+    "event_create_recurring": lambda: EventCreate(
+        start="2024-04-01 12:00", stop="2024-04-01 13:00", tags=["Maintenance"],
+        recurrence={"frequency": "weekly", "count": 10}
+    ),
+    "get_event_out": lambda: get_event_out(id=str(EVENT_DOCUMENT["_id"]), event=EVENT_DOCUMENT),
+    "get_event_out_json": lambda: get_event_out(id=str(EVENT_DOCUMENT["_id"]), event=EVENT_DOCUMENT).model_dump_json(),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the events models")
+    parser.add_argument("--number", type=int, default=10000, help="Calls per measure")
+    parser.add_argument("--repeat", type=int, default=5, help="Measures per benchmark, the best one is kept")
+    parser.add_argument("--output", default=None, help="JSON results file (stdout by default)")
+    args = parser.parse_args()
+
+    results = []
+    for name, function in BENCHMARKS.items():
+        best = min(timeit.repeat(function, number=args.number, repeat=args.repeat))
+        result = {"benchmark": name, "us_per_call": round(best / args.number * 1e6, 3), "calls_per_second": round(args.number / best)}
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+    output = json.dumps({"results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Compares two benchmark JSON reports (of bench_api or bench_models), for example between two commits.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+KEYS = ("mode", "size", "route", "concurrency", "benchmark")
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "us_per_call")
+
+def load_results(path):
+    with open(path) as report_file:
+        results = json.load(report_file)["results"]
+    return {tuple(result.get(key) for key in KEYS): result for result in results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    before, after = load_results(args.before), load_results(args.after)
+    for key in sorted(before.keys() & after.keys(), key=str):
+        name = " ".join(str(value) for value in key if value is not None)
+        changes = []
+        for metric in METRICS:
+            old, new = before[key].get(metric), after[key].get(metric)
+            if old and new is not None:
+                changes.append(f"{metric} {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+        print(f"{name}: {', '.join(changes)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import random
+from datetime import datetime, timedelta
+from app.db.storage import get_storage, EventsFilter
+
+TAGS = [f"tag{index}" for index in range(50)]
+
+def generate_events(size: int, seed: int = 0):
+    """
+    Deterministic events dataset: a third of stopped events, a third of running events
+    (half of them without stop) and a third of future events, with 1 to 3 tags each.
+    """
+    generator = random.Random(seed)
+    now = datetime.now()
+    events = []
+    for index in range(size):
+        kind = index % 3
+        duration = timedelta(hours=generator.randint(1, 48))
+        if kind == 0:
+            start = now - timedelta(days=generator.randint(2, 365))
+        elif kind == 1:
+            start = now - duration / 2
+        else:
+            start = now + timedelta(days=generator.randint(1, 365))
+        stop = None if kind == 1 and index % 2 else start + duration
+        events.append({"start": start, "stop": stop, "tags": generator.sample(TAGS, generator.randint(1, 3))})
+    return events
+
+async def seed_events(size: int, seed: int = 0, batch_size: int = 1000):
+    # The existing events of the configured storage are deleted before seeding
+    storage = get_storage()
+    await storage.delete_events(EventsFilter())
+    events = generate_events(size, seed)
+    for index in range(0, size, batch_size):
+        await storage.insert_events(events[index:index + batch_size])
@@ -0,0 +1,28 @@
+"""
+Benchmark server: seeds the configured storage (STORAGE_BACKEND) with a dataset,
+then serves the application with uvicorn.
+
+    python -m benchmarks.server --size 10000 --port 8001
+"""
+import argparse
+import uvicorn
+from app.main import app
+from benchmarks.dataset import seed_events
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the events storage and run the application")
+    parser.add_argument("--size", type=int, default=10000, help="Number of seeded events")
+    parser.add_argument("--seed", type=int, default=0, help="Dataset random seed")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    # Registered after the application startup handlers, so the storage is already opened
+    @app.on_event("startup")
+    async def seed():
+        await seed_events(args.size, args.seed)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
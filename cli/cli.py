@@ -1,8 +1,33 @@
 import click
 import asyncio
+import shlex
 from app.crud import events_crud
 from app.models.events import *
-from app.db.mongodb import create_mongodb_connection, close_mongodb_connection
+from app.db.storage import open_storage, close_storage, get_storage
+from datetime import datetime
+
+class Session:
+    """
+    Commands session of the shell and run commands: the parsed commands coroutines are collected
+    instead of being run, so all of them share one event loop and one storage connection
+    """
+    commands: list = None
+
+session = Session()
+
+def run(coroutine, storage=True):
+    # Runs a command coroutine with its own event loop and storage connection, or adds it to the session
+    if session.commands is not None:
+        session.commands.append(coroutine)
+        return
+    asyncio.run(with_storage(coroutine) if storage else coroutine)
+
+async def with_storage(coroutine):
+    await open_storage()
+    try:
+        await coroutine
+    finally:
+        await close_storage()
 
 @click.group()
 def cli():
@@ -14,108 +39,88 @@ def cli():
 @click.option("--tags", multiple=True, help="Tags for the event")
 def add_event_command(start, stop, tags):
     try:
-        asyncio.run(add_event(start, stop, tags))
+        run(add_event(start, stop, tags))
     except Exception as e:
         click.echo(f"Failed: {e}", err=True)
         raise SystemExit(1)
 
 async def add_event(start, stop, tags):
-    await create_mongodb_connection()
-    try:
-        event = EventCreate(
-            start=start,
-            stop=stop if stop else None,
-            tags=list(tags)
-        )
-        new_event = await events_crud.create_event(event)
-        click.echo(f"Created new event: {new_event}")
-    finally:
-        await close_mongodb_connection()
+    event = EventCreate(
+        start=start,
+        stop=stop if stop else None,
+        tags=list(tags)
+    )
+    new_event = await events_crud.create_event(event)
+    click.echo(f"Created new event: {new_event}")
 
 @cli.command("list-all-events")
 @click.option("--skip", default=0)
 @click.option("--limit", default=10)
 def list_all_events_command(skip, limit):
     try:
-        asyncio.run(list_events(skip, limit))
+        run(list_events(skip, limit))
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         raise SystemExit(1)
 
 async def list_events(skip, limit):
-    await create_mongodb_connection()
-    try:
-        events = await events_crud.get_all_events(skip=skip, limit=limit)
-        for event in events['results']:
-            click.echo(f"Event with ID: {event.id}, Start time: {event.start} "
-                       f"- Stop time: {event.stop} | Tags: {event.tags}")
-    finally:
-        await close_mongodb_connection()
+    events = await events_crud.get_all_events(skip=skip, limit=limit)
+    for event in events['results']:
+        click.echo(f"Event with ID: {event.id}, Start time: {event.start} "
+                   f"- Stop time: {event.stop} | Tags: {event.tags}")
 
 @cli.command("list-running-events")
 @click.option("--skip", default=0)
 @click.option("--limit", default=10)
 def list_running_events_command(skip, limit):
     try:
-        asyncio.run(list_running_events(skip, limit))
+        run(list_running_events(skip, limit))
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         raise SystemExit(1)
 
 async def list_running_events(skip, limit):
-    await create_mongodb_connection()
-    try:
-        events = await events_crud.get_running_events(skip=skip, limit=limit)
-        for event in events['results']:
-            click.echo(f"Running event with ID: {event.id}, Start time: {event.start} "
-                       f"- Stop time: {event.stop} | Tags: {event.tags}")
-    finally:
-        await close_mongodb_connection()
+    events = await events_crud.get_running_events(skip=skip, limit=limit)
+    for event in events['results']:
+        click.echo(f"Running event with ID: {event.id}, Start time: {event.start} "
+                   f"- Stop time: {event.stop} | Tags: {event.tags}")
 
 @cli.command("delete-event")
 @click.option("--event_id")
 @click.option("--force_delete", default=False)
 def delete_event_command(event_id, force_delete):
     try:
-        asyncio.run(delete_event_from_id(event_id, force_delete))
+        run(delete_event_from_id(event_id, force_delete))
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         raise SystemExit(1)
 
 async def delete_event_from_id(event_id, force_delete):
-    await create_mongodb_connection()
-    try:
-        event_deleted = await events_crud.delete_event(event_id, force_delete)
-        if event_deleted:
-            click.echo(f"Event with ID {event_id}, has been deleted successfully")
-        else:
-            click.echo(f"Event with ID {event_id}, cannot be deleted")
-    finally:
-        await close_mongodb_connection()
+    event_deleted = await events_crud.delete_event(event_id, force_delete)
+    if event_deleted:
+        click.echo(f"Event with ID {event_id}, has been deleted successfully")
+    else:
+        click.echo(f"Event with ID {event_id}, cannot be deleted")
 
 @cli.command("delete-all-events")
 @click.option("--force_delete", default=False)
 def delete_all_events_command(force_delete):
     try:
-        asyncio.run(delete_events(force_delete))
+        run(delete_events(force_delete))
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         raise SystemExit(1)
 
 async def delete_events(force_delete):
-    await create_mongodb_connection()
-    try:
-        total_events, deleted_events = await events_crud.delete_all_events(force_delete)
-        if total_events == deleted_events > 0:
-            click.echo(f"All of {deleted_events} events have been deleted successfully")
-        elif total_events > deleted_events > 0:
-            click.echo(f"All of {deleted_events} stopped events have been deleted successfully")
-        elif total_events == deleted_events == 0:
-            click.echo(f"There is no events to delete ! all events have been deleted")
-        else:
-            click.echo(f"We cannot delete events, because there is only running events and force_delete=False")
-    finally:
-        await close_mongodb_connection()
+    total_events, deleted_events = await events_crud.delete_all_events(force_delete)
+    if total_events == deleted_events > 0:
+        click.echo(f"All of {deleted_events} events have been deleted successfully")
+    elif total_events > deleted_events > 0:
+        click.echo(f"All of {deleted_events} stopped events have been deleted successfully")
+    elif total_events == deleted_events == 0:
+        click.echo(f"There is no events to delete ! all events have been deleted")
+    else:
+        click.echo(f"We cannot delete events, because there is only running events and force_delete=False")
 
 @cli.command("search-event")
 @click.option("--skip", default=0)
@@ -123,20 +128,16 @@ async def delete_events(force_delete):
 @click.option("--tags", multiple=True, help="Tags used for searching events")
 def searching_event_command(tags, skip, limit):
     try:
-        asyncio.run(searching_event(tags, skip, limit))
+        run(searching_event(tags, skip, limit))
     except Exception as e:
         click.echo(f"Failed: {e}", err=True)
         raise SystemExit(1)
 
 async def searching_event(tags, skip, limit):
-    await create_mongodb_connection()
-    try:
-        events = await events_crud.search_event(tags, skip, limit)
-        for event in events['results']:
-            click.echo(f"Found event with ID: {event.id}, Start time: {event.start} "
-                       f"- Stop time: {event.stop} | Tags: {event.tags}")
-    finally:
-        await close_mongodb_connection()
+    events = await events_crud.search_event(tags, skip, limit)
+    for event in events['results']:
+        click.echo(f"Found event with ID: {event.id}, Start time: {event.start} "
+                   f"- Stop time: {event.stop} | Tags: {event.tags}")
 
 @cli.command("update-event-tags")
 @click.option("--event_id")
@@ -144,18 +145,14 @@ async def searching_event(tags, skip, limit):
 @click.option("--tags", multiple=True, help="Tags used for searching events")
 def updating_event_tags_command(event_id, replace, tags):
     try:
-        asyncio.run(updating_event_tags(event_id, replace, tags))
+        run(updating_event_tags(event_id, replace, tags))
     except Exception as e:
         click.echo(f"Failed: {e}", err=True)
         raise SystemExit(1)
 
 async def updating_event_tags(event_id, replace, tags):
-    await create_mongodb_connection()
-    try:
-        updated_event = await events_crud.updating_event_tags(event_id, tags, replace)
-        click.echo(f"Updated event: {updated_event}")
-    finally:
-        await close_mongodb_connection()
+    updated_event = await events_crud.updating_event_tags(event_id, tags, replace)
+    click.echo(f"Updated event: {updated_event}")
 
 @cli.command("update-event-datetime")
 @click.option("--event_id")
@@ -163,18 +160,14 @@ async def updating_event_tags(event_id, replace, tags):
 @click.option("--stop", default=None, help="Stop datetime")
 def updating_event_datetime_command(event_id, start, stop):
     try:
-        asyncio.run(updating_event_date(event_id, start, stop))
+        run(updating_event_date(event_id, start, stop))
     except Exception as e:
         click.echo(f"Failed: {e}", err=True)
         raise SystemExit(1)
 
 async def updating_event_date(event_id, start, stop):
-    await create_mongodb_connection()
-    try:
-        updated_event = await events_crud.updating_event_datetime(event_id, start, stop)
-        click.echo(f"Updated event: {updated_event}")
-    finally:
-        await close_mongodb_connection()
+    updated_event = await events_crud.updating_event_datetime(event_id, start, stop)
+    click.echo(f"Updated event: {updated_event}")
 
 @cli.command("update-event-datetime-by-tags")
 @click.option("--tags", multiple=True, help="Tags used for searching events")
@@ -182,23 +175,156 @@ async def updating_event_date(event_id, start, stop):
 @click.option("--stop", default=None, help="Stop datetime")
 def updating_event_datetime_by_tags_command(tags, start, stop):
     try:
-        asyncio.run(updating_event_date_by_tags(list(tags), start, stop))
+        run(updating_event_date_by_tags(list(tags), start, stop))
     except Exception as e:
         click.echo(f"Failed: {e}", err=True)
         raise SystemExit(1)
 
 async def updating_event_date_by_tags(tags, start, stop):
-    await create_mongodb_connection()
+    updated_events_count, matched_events_count = await events_crud.update_events_based_on_tags(tags, start, stop)
+    if updated_events_count > 0:
+        click.echo(f"{updated_events_count} events datetime have been updated successfully")
+    elif updated_events_count == 0 and matched_events_count > 0:
+        click.echo(f"Events with tags {tags} have been already updated with the same start and stop times")
+    else:
+        click.echo(f"There is no events to update with the tags {tags}")
+
+@cli.command("generate-events")
+@click.option("--count", required=True, type=int, help="Number of generated events")
+@click.option("--seed", default=0, type=int, help="Random seed, the same seed generates the same events")
+@click.option("--profile", default="production", type=click.Choice(["uniform", "production", "running-heavy"]),
+              help="Tags popularity, intervals and past/running/future ratios profile")
+@click.option("--batch_size", default=10000, type=int, help="Number of events generated and inserted at once")
+@click.option("--now", default=None, help="Reference datetime of the past/running/future events ('now' for the current datetime, 2025-01-01 by default)")
+@click.option("--output", default=None, help="NDJSON output file ('-' for stdout), the events are inserted in the database if not given")
+def generate_events_command(count, seed, profile, batch_size, now, output):
     try:
-        updated_events_count, matched_events_count = await events_crud.update_events_based_on_tags(tags, start, stop)
-        if updated_events_count > 0:
-            click.echo(f"{updated_events_count} events datetime have been updated successfully")
-        elif updated_events_count == 0 and matched_events_count > 0:
-            click.echo(f"Events with tags {tags} have been already updated with the same start and stop times")
-        else:
-            click.echo(f"There is no events to update with the tags {tags}")
+        reference = datetime.now() if now == "now" else parse_date_formats(now)
+        if isinstance(reference, str):
+            reference = datetime.fromisoformat(reference)
+        run(generate_events(count, seed, profile, batch_size, reference, output), storage=not output)
+    except Exception as e:
+        click.echo(f"Failed: {e}", err=True)
+        raise SystemExit(1)
+
+async def generate_events(count, seed, profile, batch_size, now, output):
+    # numpy is only imported by this command
+    from app.crud.events_generator import generate_events as generate_events_batches, to_ndjson
+    batches = generate_events_batches(count, seed, profile, batch_size, now)
+    if output:
+        with click.open_file(output, "w") as output_file:
+            for batch in batches:
+                output_file.write(to_ndjson(batch))
+        if output != "-":
+            click.echo(f"{count} events have been written to {output}")
+        return
+    storage = get_storage()
+    inserted_events = 0
+    for batch in batches:
+        await storage.insert_events(batch)
+        inserted_events += len(batch)
+        click.echo(f"{inserted_events}/{count} events have been inserted")
+
+def parse_command(line):
+    """
+    Parses a shell or script line as a cli command, and returns its coroutines (None if the line is invalid)
+    """
+    args = shlex.split(line, comments=True)
+    if not args:
+        return []
+    session.commands = []
+    try:
+        cli.main(args, prog_name="cli.py", standalone_mode=False)
+    except click.ClickException as e:
+        e.show()
+        return None
+    except (SystemExit, click.Abort):
+        return None
     finally:
-        await close_mongodb_connection()
+        commands, session.commands = session.commands, None
+    return commands
+
+async def run_command(coroutine):
+    try:
+        await coroutine
+        return True
+    except Exception as e:
+        click.echo(f"Failed: {e}", err=True)
+        return False
+
+async def run_session(read_line, concurrency=1):
+    """
+    Runs the commands lines until read_line returns None, on one storage connection.
+    With concurrency > 1, up to concurrency commands run at the same time: a "wait" line
+    waits for the running commands, before running the commands which depend on them.
+    Returns the number of failed commands.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    running = set()
+    failures = 0
+
+    async def run_concurrently(coroutine):
+        nonlocal failures
+        try:
+            if not await run_command(coroutine):
+                failures += 1
+        finally:
+            semaphore.release()
+
+    await open_storage()
+    try:
+        while True:
+            # The lines are read in a thread, so the running commands go on while waiting for input
+            line = await loop.run_in_executor(None, read_line)
+            if line is None:
+                break
+            if line.strip() == "wait":
+                await asyncio.gather(*running)
+                continue
+            commands = parse_command(line)
+            if commands is None:
+                failures += 1
+                continue
+            for coroutine in commands:
+                if concurrency <= 1:
+                    failures += not await run_command(coroutine)
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(run_concurrently(coroutine))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        await asyncio.gather(*running)
+    finally:
+        await close_storage()
+    return failures
+
+def read_shell_line():
+    try:
+        line = input("events> ")
+    except EOFError:
+        return None
+    if line.strip() in ("exit", "quit"):
+        return None
+    return "--help" if line.strip() == "help" else line
+
+@cli.command("shell")
+def shell_command():
+    if session.commands is not None:
+        raise click.UsageError("The shell cannot be started from a session")
+    click.echo("Events management shell: type help to list the commands, exit to quit")
+    asyncio.run(run_session(read_shell_line))
+
+@cli.command("run")
+@click.option("--script", required=True, type=click.File("r"), help="Commands file, one command per line ('-' for stdin)")
+@click.option("--concurrency", default=1, type=click.IntRange(min=1), help="Number of commands running at the same time")
+def run_script_command(script, concurrency):
+    if session.commands is not None:
+        raise click.UsageError("A script cannot be run from a session")
+    failures = asyncio.run(run_session(lambda: script.readline() or None, concurrency))
+    if failures:
+        click.echo(f"{failures} commands failed", err=True)
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     cli()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock
+from app.main import app
+from app.routes.admission import AdmissionController, Overloaded, RouteClass, READ, BULK, admission_controller, admission_shed_total
+
+def get_controller(max_concurrency=1):
+    return AdmissionController(max_concurrency, {
+        READ: RouteClass(READ, 0, limit=1, queue_size=2, timeout=1),
+        BULK: RouteClass(BULK, 2, limit=1, queue_size=1, timeout=0.05),
+    })
+
+# Test that the waiting reads are admitted before the bulk operations
+@pytest.mark.asyncio
+async def test_reads_priority():
+    controller = get_controller()
+    await controller.acquire(BULK)
+    admitted = []
+
+    async def request(name):
+        await controller.acquire(name)
+        admitted.append(name)
+        controller.release(name)
+
+    bulk = asyncio.create_task(request(BULK))
+    await asyncio.sleep(0)
+    read = asyncio.create_task(request(READ))
+    await asyncio.sleep(0)
+    controller.release(BULK)
+    await asyncio.gather(bulk, read)
+
+    assert admitted == [READ, BULK]
+    assert controller.in_flight == 0
+
+# Test the bounded queue and the deadline
+@pytest.mark.asyncio
+async def test_shedding():
+    controller = get_controller()
+    await controller.acquire(BULK)
+    waiting = asyncio.create_task(controller.acquire(BULK))
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded) as queue_full:
+        await controller.acquire(BULK)
+    assert queue_full.value.reason == "queue_full"
+    with pytest.raises(Overloaded) as timeout:
+        await waiting
+    assert timeout.value.reason == "timeout"
+    assert not controller.route_classes[BULK].waiters
+
+# Test the 503 response with Retry-After
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_overloaded_response(mock_get_events):
+    mock_get_events.return_value = {"total": 0, "skip": 0, "limit": 10, "results": []}
+    with patch.object(admission_controller, "acquire", AsyncMock(side_effect=Overloaded("queue_full"))):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/events/list_events/")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert admission_shed_total.value(READ, "queue_full") >= 1
+    mock_get_events.assert_not_called()
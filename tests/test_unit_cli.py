@@ -0,0 +1,39 @@
+import io
+import pytest
+from app.db.memory_storage import MemoryEventsStorage
+from app.db.storage import get_storage, set_storage
+from cli.cli import parse_command, run_session
+
+@pytest.fixture
+def memory_storage():
+    previous_storage = get_storage()
+    storage = MemoryEventsStorage()
+    set_storage(storage)
+    yield storage
+    set_storage(previous_storage)
+
+# Test that the parsed commands are collected instead of being run
+def test_parse_command():
+    commands = parse_command('search-event --tags "my tag" --limit 5')
+    assert len(commands) == 1
+    commands[0].close()
+    assert parse_command("# comment") == []
+    assert parse_command("unknown-command") is None
+
+# Test a script running on one storage session, with concurrent commands
+@pytest.mark.asyncio
+async def test_run_session(memory_storage, capsys):
+    script = io.StringIO(
+        "add-event --start '2025-01-01 10:00:00' --stop '2025-01-01 11:00:00' --tags a\n"
+        "add-event --start '2025-01-02 10:00:00' --stop '2025-01-02 11:00:00' --tags a\n"
+        "wait\n"
+        "search-event --tags a\n"
+        "delete-event --event_id invalid\n"
+    )
+    failures = await run_session(lambda: script.readline() or None, concurrency=2)
+
+    output = capsys.readouterr()
+    assert failures == 1
+    assert output.out.count("Created new event") == 2
+    assert output.out.count("Found event with ID") == 2
+    assert "Invalid event ID format" in output.err
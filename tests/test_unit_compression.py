@@ -0,0 +1,85 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from app.main import app
+from app.routes.compression import CompressionMiddleware, add_vary, get_encoding, zstandard
+
+async def large(request):
+    return PlainTextResponse("event " * 1000)
+
+async def small(request):
+    return PlainTextResponse("event")
+
+async def stream(request):
+    async def chunks():
+        yield "data: " + "event " * 1000 + "\n\n"
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+compressed_app = CompressionMiddleware(
+    Starlette(routes=[Route("/large", large), Route("/small", small), Route("/stream", stream)]), minimum_size=500
+)
+
+# Test the Accept-Encoding negotiation
+def test_get_encoding():
+    def scope(accept_encoding):
+        return {"headers": [(b"accept-encoding", accept_encoding.encode())]}
+    assert get_encoding(scope("gzip, deflate, br, zstd"), ("zstd", "gzip")) == "zstd"
+    assert get_encoding(scope("zstd;q=0.5, gzip"), ("zstd", "gzip")) == "gzip"
+    assert get_encoding(scope("gzip;q=0, br"), ("zstd", "gzip")) is None
+    assert get_encoding(scope("*"), ("gzip",)) == "gzip"
+    assert get_encoding({"headers": []}, ("gzip",)) is None
+
+# Test that Accept-Encoding is merged into an existing Vary header
+def test_add_vary():
+    assert add_vary([]) == [(b"vary", b"Accept-Encoding")]
+    assert add_vary([(b"vary", b"Origin")]) == [(b"vary", b"Origin, Accept-Encoding")]
+    assert add_vary([(b"vary", b"origin, accept-encoding")]) == [(b"vary", b"origin, accept-encoding")]
+    assert add_vary([(b"vary", b"*")]) == [(b"vary", b"*")]
+
+# Test the compression threshold and the streams exclusion
+@pytest.mark.asyncio
+async def test_gzip_compression():
+    transport = ASGITransport(app=compressed_app)
+    async with AsyncClient(transport=transport, base_url="http://test", headers={"Accept-Encoding": "gzip"}) as client:
+        large_response = await client.get("/large")
+        small_response = await client.get("/small")
+        stream_response = await client.get("/stream")
+
+    assert large_response.headers["content-encoding"] == "gzip"
+    assert int(large_response.headers["content-length"]) < 1000
+    assert large_response.text == "event " * 1000
+    assert "content-encoding" not in small_response.headers
+    assert small_response.text == "event"
+    assert "content-encoding" not in stream_response.headers
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+async def test_zstd_compression():
+    transport = ASGITransport(app=compressed_app)
+    async with AsyncClient(transport=transport, base_url="http://test", headers={"Accept-Encoding": "zstd, gzip"}) as client:
+        response = await client.get("/large")
+
+    assert response.headers["content-encoding"] == "zstd"
+    # httpx decodes the zstd responses
+    assert response.text == "event " * 1000
+
+# Test the fields selection of the listing routes
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_list_events_fields(mock_get_events):
+    mock_get_events.return_value = {
+        "total": 1, "skip": 0, "limit": 10,
+        "results": [{"id": "6631c5d82fda6e60f14e2a3a", "start": None, "tags": ["Cloud"]}]
+    }
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/events/list_events/?fields=tags,start,id")
+        unknown_field = await client.get("/events/list_events/?fields=owner")
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"id": "6631c5d82fda6e60f14e2a3a", "start": None, "tags": ["Cloud"]}]
+    mock_get_events.assert_awaited_once_with(0, 10, fields=["start", "tags"])
+    assert unknown_field.status_code == 422
@@ -199,4 +199,97 @@ async def test_add_event_bad_date_format():
             "tags": ["Hello", "Test"]
         })
 
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_add_recurring_event_without_stop():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/events/add_event/", json={
+            "start": "2025-01-06 22:00",
+            "tags": ["Maintenance"],
+            "recurrence": {"frequency": "weekly"}
+        })
+
+    assert response.status_code == 422
+
+# Test /occurrences
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_event_occurrences", new_callable=AsyncMock)
+async def test_list_event_occurrences(mock_occurrences):
+    event_id = "6631c5d82fda6e60f14e2a3a"
+    mock_occurrences.return_value = {
+        "id": event_id,
+        "skip": 0,
+        "limit": 10,
+        "results": [
+            {"start": "2025-03-03T22:00:00", "stop": "2025-03-03T23:00:00"},
+            {"start": "2025-03-10T22:00:00", "stop": "2025-03-10T23:00:00"}
+        ]
+    }
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(f"/events/occurrences/{event_id}/?start=2025-03-01T00:00:00&stop=2025-03-15T00:00:00")
+
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 2
+    mock_occurrences.assert_awaited_once_with(event_id, datetime(2025, 3, 1), datetime(2025, 3, 15), 0, 10)
+
+# Test the /occurrences errors: unknown id, invalid id and invalid limit
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_storage")
+async def test_list_event_occurrences_errors(mock_get_storage):
+    mock_get_storage.return_value.get_event = AsyncMock(return_value=None)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        unknown_id = await client.get("/events/occurrences/6631c5d82fda6e60f14e2a3a/")
+        invalid_id = await client.get("/events/occurrences/invalid/")
+        negative_limit = await client.get("/events/occurrences/6631c5d82fda6e60f14e2a3a/?limit=-1")
+
+    assert unknown_id.status_code == 404
+    assert invalid_id.status_code == 400
+    assert negative_limit.status_code == 422
+
+# Test /events/{event_id}
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_event_by_id", new_callable=AsyncMock)
+async def test_get_event(mock_get_event):
+    event_id = "6631c5d82fda6e60f14e2a3a"
+    mock_get_event.return_value = {"id": event_id, "start": "2025-05-01T10:00:00", "stop": None, "tags": ["Cloud"]}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(f"/events/{event_id}")
+
+    assert response.status_code == 200
+    assert response.json()["tags"] == ["Cloud"]
+    mock_get_event.assert_awaited_once_with(event_id)
+
+# Test that the other routes paths without their trailing slash are not taken as events ids
+@pytest.mark.asyncio
+async def test_get_event_path_redirects():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/events/list_events")
+        unknown_path = await client.get("/events/not-an-event-id")
+
+    assert response.status_code == 307
+    assert response.headers["location"] == "http://test/events/list_events/"
+    assert unknown_path.status_code == 404
+
+# Test /events/get_many
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_many_events", new_callable=AsyncMock)
+async def test_get_many_events(mock_get_many):
+    event_ids = ["6631c5d82fda6e60f14e2a3a", "6631c5d82fda6e60f14e2a3b"]
+    mock_get_many.return_value = {
+        "total": 1,
+        "results": [{"id": event_ids[0], "start": "2025-05-01T10:00:00", "stop": None, "tags": ["Cloud"]}],
+        "not_found": [event_ids[1]]
+    }
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/events/get_many", json={"ids": event_ids})
+
+    assert response.status_code == 200
+    assert response.json()["not_found"] == [event_ids[1]]
+    mock_get_many.assert_awaited_once_with(event_ids)
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime
+from unittest.mock import patch
+from app.crud.events_generator import generate_events, to_ndjson
+from app.models.events import EventCreate
+
+now = datetime(2025, 1, 1, 12)
+
+# Test that the generated events only depend on the seed
+def test_generate_events_deterministic():
+    first = [to_ndjson(batch) for batch in generate_events(2500, seed=7, batch_size=1000, now=now)]
+    second = [to_ndjson(batch) for batch in generate_events(2500, seed=7, batch_size=1000, now=now)]
+    other = [to_ndjson(batch) for batch in generate_events(2500, seed=8, batch_size=1000, now=now)]
+    assert [len(batch.splitlines()) for batch in first] == [1000, 1000, 500]
+    assert first == second
+    assert first != other
+
+# Test the past/running/future ratios and the validity of the generated events
+def test_generate_events_profile():
+    events = [event for batch in generate_events(10000, profile="running-heavy", now=now) for event in batch]
+    running = [event for event in events if event["start"] <= now and (event["stop"] is None or event["stop"] > now)]
+    past = [event for event in events if event["stop"] is not None and event["stop"] <= now]
+    assert 0.55 < len(running) / len(events) < 0.65
+    assert 0.15 < len(past) / len(events) < 0.25
+    assert all(event["stop"] is None or event["stop"] > event["start"] for event in events)
+    for line in to_ndjson(events[:100]).splitlines():
+        EventCreate(**json.loads(line))
+
+# Test that the default reference datetime doesn't depend on the current time
+def test_generate_events_default_reference():
+    first = [to_ndjson(batch) for batch in generate_events(100, seed=1)]
+    with patch("app.crud.events_generator.datetime") as mock_datetime:
+        mock_datetime.now.return_value = datetime(2030, 6, 1)
+        second = [to_ndjson(batch) for batch in generate_events(100, seed=1)]
+    assert first == second
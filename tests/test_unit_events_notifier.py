@@ -0,0 +1,126 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+from app.notifications.events_notifier import EventsNotifier
+
+async def next_notification(subscriber, timeout=1):
+    return await asyncio.wait_for(subscriber.queue.get(), timeout)
+
+# Test the started and stopped notifications, filtered by tags
+@pytest.mark.asyncio
+async def test_started_and_stopped_notifications():
+    notifier = EventsNotifier()
+    notifier.start_timer()
+    cloud_subscriber = notifier.subscribe(["Cloud"])
+    database_subscriber = notifier.subscribe(["Database"])
+    now = datetime.now()
+    notifier.schedule({
+        "id": "1",
+        "start": now + timedelta(milliseconds=50),
+        "stop": now + timedelta(milliseconds=100),
+        "tags": ["Cloud", "AWS"]
+    })
+
+    started = await next_notification(cloud_subscriber)
+    stopped = await next_notification(cloud_subscriber)
+    database_subscriber_notified = not database_subscriber.queue.empty()
+    await notifier.stop()
+
+    assert started["type"] == "started"
+    assert started["event"]["id"] == "1"
+    assert stopped["type"] == "stopped"
+    assert not database_subscriber_notified
+
+# Test that rescheduling or deleting an event cancels its previous instants
+@pytest.mark.asyncio
+async def test_rescheduled_and_deleted_events():
+    notifier = EventsNotifier()
+    notifier.start_timer()
+    subscriber = notifier.subscribe()
+    now = datetime.now()
+    notifier.schedule({"id": "1", "start": now + timedelta(milliseconds=50), "stop": None, "tags": ["Test"]})
+    notifier.event_changed({"id": "1", "start": now + timedelta(hours=1), "stop": None, "tags": ["Test"]})
+    notifier.schedule({"id": "2", "start": now + timedelta(milliseconds=50), "stop": None, "tags": ["Test"]})
+    notifier.event_deleted("2")
+
+    changed = await next_notification(subscriber)
+    deleted = await next_notification(subscriber)
+    await asyncio.sleep(0.1)
+    await notifier.stop()
+
+    assert changed["type"] == "changed"
+    assert deleted["type"] == "deleted"
+    # Only the stream end marker is left, no started notification
+    assert subscriber.queue.get_nowait() is None
+    assert subscriber.queue.empty()
+
+# Test the Server-Sent Events format
+@pytest.mark.asyncio
+async def test_stream_format():
+    notifier = EventsNotifier()
+    subscriber = notifier.subscribe()
+    stream = notifier.stream(subscriber, keepalive=0.01)
+    assert await stream.__anext__() == ": subscribed\n\n"
+    assert await stream.__anext__() == ": keepalive\n\n"
+    notifier.publish("changed", {"id": "1", "start": datetime(2024, 4, 1, 12), "stop": None, "tags": ["Test"]})
+    message = await stream.__anext__()
+    assert message.startswith("event: changed\ndata: ")
+    assert '"start": "2024-04-01T12:00:00"' in message
+    await stream.aclose()
+    assert subscriber not in notifier.subscribers
+
+# Test that each occurrence of a recurring event is notified
+@pytest.mark.asyncio
+async def test_recurring_event_notifications():
+    notifier = EventsNotifier()
+    notifier.start_timer()
+    subscriber = notifier.subscribe()
+    start = datetime.now() - timedelta(hours=1) + timedelta(milliseconds=50)
+    notifier.schedule({
+        "id": "1",
+        "start": start,
+        "stop": start + timedelta(minutes=30),
+        "tags": ["Maintenance"],
+        "recurrence": {"frequency": "hourly", "interval": 1, "count": 2, "until": None}
+    })
+
+    started = await next_notification(subscriber)
+    await notifier.stop()
+
+    assert started["type"] == "started"
+    assert started["event"]["next_start"] == start + timedelta(hours=1)
+    # The stop of the second (and last) occurrence is still pending
+    assert len(notifier._heap) == 1
+
+# Test that the instants keep firing during a reload, and that the changes made meanwhile are kept
+@pytest.mark.asyncio
+async def test_reload_keeps_firing():
+    notifier = EventsNotifier()
+    notifier.start_timer()
+    subscriber = notifier.subscribe()
+    now = datetime.now()
+    running_event = {"_id": "1", "start": now + timedelta(milliseconds=50), "stop": now + timedelta(hours=1), "tags": []}
+    notifier.schedule(dict(running_event, id="1"))
+    storage_read = asyncio.Event()
+
+    async def find_events(events_filter):
+        await storage_read.wait()
+        yield dict(running_event)
+        # Stale document of an event changed during the load
+        yield {"_id": "2", "start": now + timedelta(hours=2), "stop": now + timedelta(hours=3), "tags": []}
+
+    storage = MagicMock()
+    storage.find_events = find_events
+    with patch("app.notifications.events_notifier.get_storage", return_value=storage):
+        load_task = asyncio.create_task(notifier.load())
+        started = await next_notification(subscriber)
+        notifier.event_changed({"id": "2", "start": now + timedelta(hours=5), "stop": now + timedelta(hours=6), "tags": []})
+        storage_read.set()
+        await load_task
+    await notifier.stop()
+
+    assert started["type"] == "started" and started["event"]["id"] == "1"
+    assert notifier._events["2"][1]["start"] == now + timedelta(hours=5)
+    # The start of the event 1 fired before the swap is not scheduled again
+    assert notifier._events["1"][2] == 1
@@ -0,0 +1,45 @@
+from datetime import datetime
+from itertools import islice
+from app.crud.events_recurrence import iter_occurrences, get_next_occurrence, get_series_fields
+
+weekly_event = {
+    "start": datetime(2025, 1, 6, 22, 0),
+    "stop": datetime(2025, 1, 6, 23, 0),
+    "tags": ["Maintenance"],
+    "recurrence": {"frequency": "weekly", "interval": 1, "count": None, "until": None}
+}
+
+# Test that the occurrences are expanded only within the window
+def test_iter_occurrences_window():
+    occurrences = list(iter_occurrences(
+        weekly_event,
+        window_start=datetime(2025, 3, 1),
+        window_stop=datetime(2025, 3, 20)
+    ))
+    assert occurrences == [
+        (datetime(2025, 3, 3, 22, 0), datetime(2025, 3, 3, 23, 0)),
+        (datetime(2025, 3, 10, 22, 0), datetime(2025, 3, 10, 23, 0)),
+        (datetime(2025, 3, 17, 22, 0), datetime(2025, 3, 17, 23, 0)),
+    ]
+
+# Test that a series without end is lazily expanded
+def test_iter_occurrences_without_end():
+    occurrences = list(islice(iter_occurrences(weekly_event, window_start=datetime(2030, 1, 1)), 2))
+    assert len(occurrences) == 2
+    assert occurrences[0][0] > datetime(2030, 1, 1) - (weekly_event["stop"] - weekly_event["start"])
+
+# Test the running occurrence, the next occurrence and the end of a series
+def test_next_occurrence_and_series_fields():
+    event = dict(weekly_event, recurrence={"frequency": "daily", "interval": 2, "count": 3, "until": None})
+    assert get_next_occurrence(event, datetime(2025, 1, 8, 22, 30)) == (datetime(2025, 1, 8, 22, 0), datetime(2025, 1, 8, 23, 0))
+    assert get_next_occurrence(event, datetime(2025, 1, 7)) == (datetime(2025, 1, 8, 22, 0), datetime(2025, 1, 8, 23, 0))
+    # The series is over, the last occurrence is returned
+    fields = get_series_fields(event, datetime(2025, 2, 1))
+    assert fields["next_start"] == datetime(2025, 1, 10, 22, 0)
+    assert fields["series_stop"] == datetime(2025, 1, 10, 23, 0)
+
+# Test the until bound of a series
+def test_iter_occurrences_until():
+    event = dict(weekly_event, recurrence={"frequency": "weekly", "interval": 1, "count": None, "until": datetime(2025, 1, 20, 22, 0)})
+    assert len(list(iter_occurrences(event))) == 3
+    assert get_series_fields(event, datetime(2025, 1, 1))["series_stop"] == datetime(2025, 1, 20, 23, 0)
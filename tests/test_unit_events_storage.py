@@ -0,0 +1,269 @@
+import pytest
+import pytest_asyncio
+from starlette.exceptions import HTTPException
+from datetime import datetime, timedelta
+from app.crud import events_crud
+from app.crud.events_cache import EventsCache, events_cache
+from app.notifications.events_notifier import events_notifier
+from app.models.events import EventOut
+from app.crud.events_recurrence import get_series_fields
+from app.db.storage import create_storage, set_storage, EventsFilter
+from app.db import sqlite_storage
+from app.db.sqlite_storage import SQLiteEventsStorage
+from app.db.mongodb_storage import MongoEventsStorage
+from app.db.memory_storage import MemoryEventsStorage
+from unittest.mock import patch
+
+@pytest_asyncio.fixture(params=["memory", "sqlite"])
+async def storage(request, tmp_path):
+    """
+    The events_crud functions are tested against the in-memory and the SQLite storage backends
+    """
+    if request.param == "sqlite":
+        backend = SQLiteEventsStorage(str(tmp_path / "events.db"))
+    else:
+        backend = create_storage(request.param)
+    await backend.open()
+    set_storage(backend)
+    events_cache.clear()
+    yield backend
+    # The notifier reload started by a bulk update
+    if events_notifier._pending_reload:
+        await events_notifier._pending_reload
+    await backend.close()
+    set_storage(None)
+
+async def insert_events(storage):
+    now = datetime.now()
+    return {
+        "stopped": await storage.insert_event({"start": now - timedelta(days=2), "stop": now - timedelta(days=1), "tags": ["Cloud"]}),
+        "running": await storage.insert_event({"start": now - timedelta(hours=1), "stop": now + timedelta(hours=1), "tags": ["Cloud", "AWS"]}),
+        "open_ended": await storage.insert_event({"start": now - timedelta(hours=1), "stop": None, "tags": ["Database"]}),
+        "future": await storage.insert_event({"start": now + timedelta(days=1), "stop": None, "tags": ["AWS"]}),
+    }
+
+# Test listing, running events and searching by tags
+@pytest.mark.asyncio
+async def test_list_running_and_search_events(storage):
+    event_ids = await insert_events(storage)
+
+    all_events = await events_crud.get_all_events(skip=1, limit=2)
+    assert all_events["total"] == 4
+    assert [event.id for event in all_events["results"]] == [event_ids["running"], event_ids["open_ended"]]
+
+    running_events = await events_crud.get_running_events(skip=0, limit=10)
+    assert {event.id for event in running_events["results"]} == {event_ids["running"], event_ids["open_ended"]}
+
+    found_events = await events_crud.search_event(["AWS"], skip=0, limit=10)
+    assert found_events["total"] == 2
+    assert [event.id for event in found_events["results"]] == [event_ids["running"], event_ids["future"]]
+
+# Test getting events by id, and the cache coherence after the updates and deletions
+@pytest.mark.asyncio
+async def test_get_events_by_id(storage):
+    event_ids = await insert_events(storage)
+    unknown_id = "6631c5d82fda6e60f14e2a3a"
+
+    event = await events_crud.get_event_by_id(event_ids["running"])
+    assert event.tags == ["Cloud", "AWS"]
+    many_events = await events_crud.get_many_events([event_ids["future"], unknown_id, event_ids["running"], event_ids["future"]])
+    assert [event.id for event in many_events["results"]] == [event_ids["future"], event_ids["running"]]
+    assert many_events["not_found"] == [unknown_id]
+
+    await events_crud.updating_event_tags(event_ids["running"], ["GCP"], replace=True)
+    assert (await events_crud.get_event_by_id(event_ids["running"])).tags == ["GCP"]
+    await events_crud.update_events_based_on_tags(["AWS"], datetime(2030, 1, 1), None)
+    assert (await events_crud.get_event_by_id(event_ids["future"])).start == datetime(2030, 1, 1)
+    await events_crud.delete_event(event_ids["stopped"])
+    with pytest.raises(HTTPException) as not_found:
+        await events_crud.get_event_by_id(event_ids["stopped"])
+    assert not_found.value.status_code == 404
+
+# Test that every backend rejects the same invalid pages, before reading anything
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage_class", [MongoEventsStorage, SQLiteEventsStorage, MemoryEventsStorage])
+@pytest.mark.parametrize("skip, limit", [(-1, None), (0, -1), (-5, 10)])
+async def test_find_events_invalid_page(storage_class, skip, limit):
+    backend = storage_class()
+    with pytest.raises(ValueError):
+        backend.find_events(EventsFilter(), skip, limit)
+    assert [event async for event in backend.find_events(EventsFilter(), 0, 0)] == []
+
+# Test the pages over several SQLite pages, compared to the in-memory backend
+@pytest.mark.asyncio
+async def test_find_events_pages(storage):
+    now = datetime.now()
+    event_ids = [await storage.insert_event({"start": now + timedelta(minutes=index), "stop": None, "tags": [str(index % 2)]})
+                 for index in range(12)]
+    with patch.object(sqlite_storage, "PAGE_SIZE", 4):
+        for skip, limit in [(0, None), (3, None), (5, 6), (0, 4), (11, 10), (12, None)]:
+            events = [event async for event in storage.find_events(EventsFilter(), skip, limit)]
+            expected = event_ids[skip:None if limit is None else skip + limit]
+            assert [str(event["_id"]) for event in events] == expected
+        odd_events = [event async for event in storage.find_events(EventsFilter(tags=["1"]), 1, 4)]
+        assert [str(event["_id"]) for event in odd_events] == event_ids[3:11:2]
+
+# Test the fields selection of the listings
+@pytest.mark.asyncio
+async def test_find_events_fields(storage):
+    event_ids = await insert_events(storage)
+
+    running_events = await events_crud.get_running_events(skip=0, limit=10, fields=["tags", "next_start"])
+    assert running_events["results"] == [
+        {"id": event_ids["running"], "tags": ["Cloud", "AWS"], "next_start": None},
+        {"id": event_ids["open_ended"], "tags": ["Database"], "next_start": None},
+    ]
+
+# Test the deletion rules
+@pytest.mark.asyncio
+async def test_delete_events(storage):
+    event_ids = await insert_events(storage)
+
+    assert await events_crud.delete_event(event_ids["future"]) is False
+    assert await events_crud.delete_event(event_ids["running"]) is False
+    assert await events_crud.delete_event(event_ids["stopped"]) is True
+    assert await events_crud.delete_event(event_ids["future"], force_delete=True) is True
+    assert await events_crud.delete_all_events() == (2, 0)
+    assert await events_crud.delete_all_events(force_delete=True) == (2, 2)
+    assert await events_crud.delete_all_events() == (0, 0)
+
+# Test updating the tags and the datetimes of the events
+@pytest.mark.asyncio
+async def test_update_events(storage):
+    event_ids = await insert_events(storage)
+
+    updated_event = await events_crud.updating_event_tags(event_ids["running"], ["AWS", "Azure"])
+    assert updated_event.tags == ["Cloud", "AWS", "Azure"]
+    updated_event = await events_crud.updating_event_tags(event_ids["running"], ["GCP"], replace=True)
+    assert updated_event.tags == ["GCP"]
+    assert (await storage.count_events(EventsFilter(tags=["Azure"]))) == 0
+
+    start = datetime(2024, 4, 1, 12)
+    assert await events_crud.update_events_based_on_tags(["Cloud", "GCP"], start) == (2, 2)
+    assert await events_crud.update_events_based_on_tags(["Cloud", "GCP"], start) == (0, 2)
+    assert await events_crud.update_events_based_on_tags(["Unknown"], start) == (0, 0)
+
+# Test that a bulk update pushes a single notification and reloads the notifier in the background
+@pytest.mark.asyncio
+async def test_update_events_notification(storage):
+    event_ids = await insert_events(storage)
+    subscriber = events_notifier.subscribe()
+    try:
+        assert await events_crud.update_events_based_on_tags(["Cloud", "AWS"], datetime.now() + timedelta(hours=1)) == (3, 3)
+        notification = subscriber.queue.get_nowait()
+        assert (notification["type"], notification["event"]) == ("changed", None)
+        assert subscriber.queue.empty()
+        await events_notifier._pending_reload
+        assert set(events_notifier._events) == {event_ids["stopped"], event_ids["running"], event_ids["future"]}
+    finally:
+        events_notifier.unsubscribe(subscriber)
+        events_notifier._heap.clear()
+        events_notifier._events.clear()
+
+# Test the refresh of the next occurrence of a recurring event
+@pytest.mark.asyncio
+async def test_recurring_running_event(storage):
+    now = datetime.now()
+    start = now - timedelta(days=10, hours=1)
+    series = {
+        "start": start,
+        "stop": start + timedelta(hours=2),
+        "tags": ["Maintenance"],
+        "recurrence": {"frequency": "daily", "interval": 1, "count": None, "until": None}
+    }
+    # The next occurrence has been computed 5 days ago
+    series.update(get_series_fields(series, now - timedelta(days=5)))
+    event_id = await storage.insert_event(series)
+    # Done by the background refresh
+    await events_crud.refresh_recurring_events(now)
+
+    running_events = await events_crud.get_running_events(skip=0, limit=10)
+    assert [event.id for event in running_events["results"]] == [event_id]
+    assert running_events["results"][0].next_start == start + timedelta(days=10)
+    assert await events_crud.delete_event(event_id) is False
+    assert await events_crud.delete_all_events() == (1, 0)
+
+# Test that the recurring events datetimes are validated before any write
+@pytest.mark.asyncio
+async def test_update_recurring_events_datetime(storage):
+    event_ids = await insert_events(storage)
+    now = datetime.now()
+    start = now - timedelta(days=3, hours=1)
+    series = {
+        "start": start,
+        "stop": start + timedelta(hours=2),
+        "tags": ["Cloud"],
+        "recurrence": {"frequency": "daily", "interval": 1, "count": None, "until": now + timedelta(days=5)}
+    }
+    series.update(get_series_fields(series, now))
+    series_id = await storage.insert_event(series)
+
+    invalid_datetimes = [
+        (now, None),
+        (now, now),
+        (now + timedelta(days=6), now + timedelta(days=6, hours=1)),
+    ]
+    for invalid_start, invalid_stop in invalid_datetimes:
+        with pytest.raises(HTTPException) as error:
+            await events_crud.updating_event_datetime(series_id, invalid_start, invalid_stop)
+        assert error.value.status_code == 400
+        with pytest.raises(HTTPException) as error:
+            await events_crud.update_events_based_on_tags(["Cloud"], invalid_start, invalid_stop)
+        assert error.value.status_code == 400
+    # Nothing has been written, and the events can still be listed
+    assert (await storage.get_event(events_crud.get_event_id(series_id)))["stop"] == series["stop"]
+    assert (await storage.get_event(events_crud.get_event_id(event_ids["stopped"])))["start"] < now - timedelta(days=1)
+    assert (await events_crud.get_all_events(skip=0, limit=10))["total"] == 5
+
+    new_start = now - timedelta(hours=1)
+    updated_event = await events_crud.updating_event_datetime(series_id, new_start, new_start + timedelta(hours=2))
+    assert (updated_event.next_start, updated_event.next_stop) == (new_start, new_start + timedelta(hours=2))
+    stored_event = await storage.get_event(events_crud.get_event_id(series_id))
+    assert stored_event["next_start"] == new_start
+    assert stored_event["series_stop"] == get_series_fields(stored_event, now)["series_stop"]
+
+    bulk_start = now - timedelta(days=1, hours=1)
+    assert await events_crud.update_events_based_on_tags(["Cloud"], bulk_start, bulk_start + timedelta(hours=2)) == (3, 3)
+    stored_event = await storage.get_event(events_crud.get_event_id(series_id))
+    assert stored_event["next_start"] == bulk_start + timedelta(days=1)
+    running_events = await events_crud.get_running_events(skip=0, limit=10)
+    assert series_id in {event.id for event in running_events["results"]}
+
+# Test the cache bound and the expiry of the recurring events occurrences
+def test_events_cache_eviction():
+    cache = EventsCache(max_size=2)
+    now = datetime(2025, 1, 1, 12)
+    for event_id in ("a", "b", "c"):
+        cache.put(EventOut(id=event_id, start=now, stop=None, tags=[]))
+    recurring_event = EventOut(id="d", start=now, stop=now + timedelta(hours=1), tags=[], recurrence={"frequency": "daily"},
+                               next_start=now, next_stop=now + timedelta(hours=1))
+    cache.put(recurring_event)
+
+    assert cache.get("a", now) is None and cache.get("b", now) is None
+    assert cache.get("d", now) is recurring_event
+    assert cache.get("d", now + timedelta(hours=2)) is None
+    assert cache.get("c", now).id == "c"
+
+# Test that a read racing with a write does not put a stale event in the cache
+def test_events_cache_versions():
+    cache = EventsCache(max_size=2)
+    now = datetime(2025, 1, 1, 12)
+    version = cache.version("a")
+    cache.invalidate("a")
+    cache.put(EventOut(id="a", start=now, stop=None, tags=["stale"]), version)
+    assert cache.get("a", now) is None
+
+    version = cache.version("a")
+    cache.put(EventOut(id="a", start=now, stop=None, tags=["fresh"]), version)
+    assert cache.get("a", now).tags == ["fresh"]
+
+    # The forgotten and cleared versions are never reused
+    version = cache.version("a")
+    for event_id in ("a", "b", "c"):
+        cache.invalidate(event_id)
+    cache.put(EventOut(id="a", start=now, stop=None, tags=["stale"]), version)
+    assert cache.get("a", now) is None
+    version = cache.version("d")
+    cache.clear()
+    cache.put(EventOut(id="d", start=now, stop=None, tags=["stale"]), version)
+    assert cache.get("d", now) is None
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.main import app
+from app.db import mongodb
+from app.db.memory_storage import MemoryEventsStorage
+from app.db.storage import get_storage, set_storage, get_retry_delay
+from app.routes.health_api import readiness
+from app.main import warm_up
+
+@pytest.fixture
+def memory_storage():
+    previous_storage = get_storage()
+    set_storage(MemoryEventsStorage())
+    yield
+    set_storage(previous_storage)
+
+# Test the liveness and readiness probes
+@pytest.mark.asyncio
+async def test_health_probes(memory_storage):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        alive = await client.get("/healthz")
+        with patch.object(readiness, "warmed_up", False), patch.object(readiness, "checked_at", None):
+            not_ready = await client.get("/readyz")
+        with patch.object(readiness, "warmed_up", True):
+            ready = await client.get("/readyz")
+
+    assert alive.status_code == 200
+    assert not_ready.status_code == 503
+    assert not_ready.json() == {"status": "not ready", "database": True, "warmed_up": False}
+    assert ready.status_code == 200
+
+# Test that the connection is retried in the background until the server answers
+@pytest.mark.asyncio
+async def test_mongodb_lazy_connection():
+    client = MagicMock()
+    client.admin.command = AsyncMock(side_effect=[Exception("connection refused"), Exception("connection refused"), {"ok": 1}])
+    with patch("app.db.mongodb.AsyncIOMotorClient", return_value=client), patch.object(mongodb.mongodb, "client", None):
+        await mongodb.create_mongodb_connection(delay=0.001, max_delay=0.01)
+        assert not mongodb.is_mongodb_connected()
+        await asyncio.wait_for(mongodb.wait_mongodb_connection(), 1)
+        assert mongodb.is_mongodb_connected()
+        assert client.admin.command.await_count == 3
+        await mongodb.close_mongodb_connection()
+
+    assert not mongodb.is_mongodb_connected()
+    client.close.assert_called_once()
+
+# Test that the readiness probe pings the database, and reuses a recent result
+@pytest.mark.asyncio
+async def test_readiness_database_ping():
+    mongo_client = MagicMock()
+    mongo_client.admin.command = AsyncMock(side_effect=[{"ok": 1}, Exception("connection refused")])
+    connected = asyncio.Event()
+    connected.set()
+    storage = MagicMock()
+    storage.ping = lambda timeout: mongodb.ping_mongodb_server(timeout)
+    with patch.object(mongodb.mongodb, "client", mongo_client), patch.object(mongodb.mongodb, "connected", connected), \
+            patch("app.routes.health_api.get_storage", return_value=storage), patch.object(readiness, "warmed_up", True), \
+            patch.object(readiness, "checked_at", None):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            ready = await client.get("/readyz")
+            cached = await client.get("/readyz")
+            readiness.checked_at = None
+            unreachable = await client.get("/readyz")
+
+    assert ready.status_code == 200 and cached.status_code == 200
+    assert unreachable.status_code == 503
+    assert unreachable.json()["database"] is False
+    assert mongo_client.admin.command.await_count == 2
+
+# Test that the warm-up is retried until the indexes are created
+@pytest.mark.asyncio
+async def test_warm_up_retry(memory_storage):
+    create_indexes = AsyncMock(side_effect=[Exception("not primary"), None])
+    with patch("app.crud.events_crud.create_events_indexes", create_indexes), \
+            patch("app.main.events_notifier.start", new_callable=AsyncMock), patch.object(readiness, "warmed_up", False):
+        await asyncio.wait_for(warm_up(delay=0.001, max_delay=0.01), 1)
+        assert readiness.warmed_up
+    assert create_indexes.await_count == 2
+
+# Test that the backoff stays bounded after a long outage
+def test_retry_delay_long_outage():
+    for attempt in (0, 1, 10, 1024, 100000):
+        assert 0 <= get_retry_delay(attempt, delay=0.5, max_delay=30) <= 30
+    assert get_retry_delay(1, delay=0.5, max_delay=30) <= 1
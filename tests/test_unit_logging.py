@@ -0,0 +1,67 @@
+import io
+import json
+import logging
+import queue
+import pytest
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock
+from app.main import app
+from app.config.logging_config import (
+    ContextQueueHandler, JsonFormatter, SamplingFilter, log_records_dropped_total, parse_sampling_rates, request_id_var,
+    setup_logging, stop_logging
+)
+
+# Test the JSON lines written by the listener thread, with the request id and the extra fields
+def test_queue_logging_json():
+    stream = io.StringIO()
+    setup_logging(level="INFO", log_format="json", sampling="", stream=stream)
+    token = request_id_var.set("request-1")
+    try:
+        logging.getLogger("app.crud.events_crud").info("event %s has been deleted successfully", "abc", extra={"event_id": "abc"})
+        logging.getLogger("app.crud.events_crud").debug("not logged")
+    finally:
+        request_id_var.reset(token)
+        stop_logging()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    log = json.loads(lines[0])
+    assert log["message"] == "event abc has been deleted successfully"
+    assert log["level"] == "INFO"
+    assert log["logger"] == "app.crud.events_crud"
+    assert log["request_id"] == "request-1"
+    assert log["event_id"] == "abc"
+
+# Test that the records are enqueued without being formatted, and dropped when the queue is full
+def test_queue_handler_does_not_format():
+    handler = ContextQueueHandler(queue.Queue(maxsize=1))
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "deleted %s", ("abc",), None)
+    handler.handle(record)
+    dropped = log_records_dropped_total.value()
+    handler.handle(logging.LogRecord("app", logging.INFO, __file__, 1, "dropped", None, None))
+
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "deleted %s" and queued.args == ("abc",)
+    assert queued.request_id is None
+    assert log_records_dropped_total.value() == dropped + 1
+    assert json.loads(JsonFormatter().format(queued))["message"] == "deleted abc"
+
+# Test the per-level sampling
+def test_sampling_filter():
+    sampling_filter = SamplingFilter(parse_sampling_rates("debug:0, INFO:1"))
+    assert not sampling_filter.filter(logging.LogRecord("app", logging.DEBUG, __file__, 1, "", None, None))
+    assert sampling_filter.filter(logging.LogRecord("app", logging.INFO, __file__, 1, "", None, None))
+    assert sampling_filter.filter(logging.LogRecord("app", logging.ERROR, __file__, 1, "", None, None))
+
+# Test the X-Request-ID header, echoed or generated
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_request_id_header(mock_get_events):
+    mock_get_events.return_value = {"total": 0, "skip": 0, "limit": 10, "results": []}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        echoed = await client.get("/events/list_events/", headers={"X-Request-ID": "my-request"})
+        generated = await client.get("/events/list_events/")
+
+    assert echoed.headers["x-request-id"] == "my-request"
+    assert len(generated.headers["x-request-id"]) == 32
@@ -0,0 +1,43 @@
+import pytest
+from types import SimpleNamespace
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock
+from app.main import app
+from app.monitoring.metrics import MetricsRegistry
+from app.monitoring.mongodb_listeners import CommandMetricsListener, mongodb_command_duration_seconds
+
+# Test the per-route requests metrics
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_metrics_endpoint(mock_get_events):
+    mock_get_events.return_value = {"total": 0, "skip": 0, "limit": 10, "results": []}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/events/list_events/")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/events/list_events/",status="200"}' in response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/events/list_events/",le="+Inf"}' in response.text
+
+# Test the histogram exposition format
+def test_histogram_render():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(2, "/a")
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 2.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+
+# Test the MongoDB commands timing
+def test_command_listener():
+    count = mongodb_command_duration_seconds.count("find")
+    CommandMetricsListener().succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+    assert mongodb_command_duration_seconds.count("find") == count + 1
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import pytest
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from app.main import app
+from app.monitoring.profiling import ProfilingMiddleware
+from app.monitoring.slow_queries import get_query_shape, get_explain_summary, record_query, ExplainLimiter
+
+list_events_result = {"total": 0, "skip": 0, "limit": 10, "results": []}
+
+# Test storing the profile of a request
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_profile_stored(mock_get_events, tmp_path):
+    mock_get_events.return_value = list_events_result
+    transport = ASGITransport(app=ProfilingMiddleware(app, enabled=True, profiles_dir=str(tmp_path)))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/events/list_events/", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
+    assert os.path.exists(tmp_path / response.headers["x-profile-file"])
+
+# Test returning the profile statistics instead of the response
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_profile_text(mock_get_events, tmp_path):
+    mock_get_events.return_value = list_events_result
+    transport = ASGITransport(app=ProfilingMiddleware(app, enabled=True, profiles_dir=str(tmp_path)))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/events/list_events/?profile=text")
+
+    assert response.status_code == 200
+    assert response.headers["x-profile-status"] == "200"
+    assert "function calls" in response.text
+
+# Test that the profiling is only allowed by the configuration
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_profile_disabled(mock_get_events, tmp_path):
+    mock_get_events.return_value = list_events_result
+    transport = ASGITransport(app=ProfilingMiddleware(app, enabled=False, profiles_dir=str(tmp_path)))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/events/list_events/?profile=text")
+
+    assert response.json()["total"] == 0
+    assert "x-profile-file" not in response.headers
+    assert not os.listdir(tmp_path)
+
+# Test the slow queries filter shape and explain summary
+def test_slow_query_summary():
+    query = {"$or": [{"start": {"$lte": datetime.now()}, "stop": None}, {"tags": {"$in": ["a", "b"]}}]}
+    assert get_query_shape(query) == {"$or": [{"start": {"$lte": "?"}, "stop": "?"}, {"tags": {"$in": ["?"]}}]}
+    summary = get_explain_summary({
+        "queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "tags_1"}}},
+        "executionStats": {"totalDocsExamined": 3, "totalKeysExamined": 4, "nReturned": 3, "executionTimeMillis": 1}
+    })
+    assert summary["plan"] == "FETCH > IXSCAN(tags_1)"
+    assert summary["collection_scan"] is False
+    assert summary["docs_examined"] == 3
+
+# Test that only the most recent profiles are kept
+@pytest.mark.asyncio
+@patch("app.crud.events_crud.get_all_events", new_callable=AsyncMock)
+async def test_profiles_retention(mock_get_events, tmp_path):
+    mock_get_events.return_value = list_events_result
+    transport = ASGITransport(app=ProfilingMiddleware(app, enabled=True, profiles_dir=str(tmp_path), max_files=2))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        profile_files = [
+            (await client.get("/events/list_events/", headers={"X-Profile": "1"})).headers["x-profile-file"]
+            for _ in range(3)
+        ]
+
+    assert sorted(os.listdir(tmp_path)) == profile_files[1:]
+
+# Test that the explains are limited per filter shape and in number
+@pytest.mark.asyncio
+async def test_slow_query_explain_limits():
+    explain = AsyncMock(return_value={})
+    with patch("app.monitoring.slow_queries.explain_limiter", ExplainLimiter(interval=60, max_running=1)) as limiter:
+        record_query("find", {"tags": {"$in": ["a"]}}, 0.5, explain)
+        record_query("find", {"tags": {"$in": ["b"]}}, 0.5, explain)
+        record_query("count", {"stop": None}, 0.5, explain)
+        assert limiter.running == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert limiter.running == 0
+        record_query("find", {"tags": {"$in": ["c"]}}, 0.5, explain)
+        record_query("count", {"stop": None}, 0.5, explain)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    assert explain.await_count == 2
+
+# Test that a profiled stream doesn't hold the other profiled requests, and is not returned as text
+@pytest.mark.asyncio
+async def test_profile_stream(tmp_path):
+    stream_ended = asyncio.Event()
+
+    async def stream(request):
+        async def chunks():
+            yield "data: first\n\n"
+            await stream_ended.wait()
+            yield "data: last\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    async def hello(request):
+        return PlainTextResponse("hello")
+
+    profiled_app = ProfilingMiddleware(
+        Starlette(routes=[Route("/stream", stream), Route("/hello", hello)]), enabled=True, profiles_dir=str(tmp_path)
+    )
+    async with AsyncClient(transport=ASGITransport(app=profiled_app), base_url="http://test") as client:
+        stream_request = asyncio.create_task(client.get("/stream", headers={"X-Profile": "text"}))
+        await asyncio.sleep(0.05)
+        hello_response = await asyncio.wait_for(client.get("/hello", headers={"X-Profile": "1"}), 1)
+        stream_ended.set()
+        stream_response = await stream_request
+
+    assert hello_response.text == "hello"
+    assert stream_response.text == "data: first\n\ndata: last\n\n"
+    assert len(os.listdir(tmp_path)) == 2
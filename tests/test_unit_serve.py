@@ -0,0 +1,64 @@
+import asyncio
+import os
+import signal
+import socket
+import httpx
+import pytest
+import uvicorn
+from unittest.mock import patch, MagicMock
+from app.main import app
+from app.db.memory_storage import MemoryEventsStorage
+from app.db.storage import get_storage, set_storage
+from app.notifications.events_notifier import events_notifier
+from app.db import mongodb
+from app.serve import get_workers
+
+# Test the default number of workers
+def test_get_workers():
+    assert get_workers(3) == 3
+    assert get_workers(0) == (os.cpu_count() or 1)
+    assert get_workers(4, storage_backend="memory") == 1
+
+# Test that a forked process doesn't reuse the Motor client of its parent
+@patch("app.db.mongodb.AsyncIOMotorClient")
+def test_get_db_after_fork(mock_client_class):
+    parent_client = MagicMock()
+    with patch.object(mongodb.mongodb, "client", parent_client), patch.object(mongodb.mongodb, "pid", os.getpid() + 1):
+        mongodb.get_db()
+        assert mongodb.mongodb.client is mock_client_class.return_value
+        assert mongodb.mongodb.pid == os.getpid()
+        mongodb.get_db()
+    mock_client_class.assert_called_once()
+
+# Test that the exit signal ends the notification streams, so the server doesn't wait for them to shut down
+@pytest.mark.asyncio
+async def test_shutdown_with_subscriber():
+    previous_storage = get_storage()
+    set_storage(MemoryEventsStorage())
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning", timeout_graceful_shutdown=30))
+
+    async def read_stream(lines):
+        return [line async for line in lines]
+
+    # The server raises the captured signal again once it stopped
+    with patch("signal.raise_signal"):
+        serve_task = asyncio.create_task(server.serve())
+        try:
+            while not server.started:
+                await asyncio.sleep(0.01)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+                async with client.stream("GET", "/events/subscribe/") as response:
+                    lines = response.aiter_lines()
+                    assert await anext(lines) == ": subscribed"
+                    signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+                    # The stream ends instead of waiting for the graceful timeout
+                    await asyncio.wait_for(read_stream(lines), 5)
+            await asyncio.wait_for(serve_task, 5)
+        finally:
+            server.should_exit = server.force_exit = True
+            await asyncio.gather(serve_task, return_exceptions=True)
+            set_storage(previous_storage)
+            events_notifier.closing = False